@@ -1,8 +1,10 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.api import routes
 from src.api.routes import router
 from src.config import settings
 
@@ -11,10 +13,26 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start model warm-up on startup and release resources on shutdown."""
+    if settings.warmup_on_startup:
+        # Loads models without blocking the server from starting
+        routes.start_warm_up()
+
+    yield
+
+    routes.shutdown()
+
+
 app = FastAPI(
     title="Boeing 737 RAG API",
     description="Retrieval-Augmented Generation API for Boeing 737 Operations Manual",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -0,0 +1,95 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+from src.ingestion.chunker import Chunk, Chunker
+from src.ingestion.pdf_parser import ParsedElement, group_by_page, group_elements_by_page
+from src.ingestion.token_chunker import ATOMIC_TYPES, TokenChunker
+
+
+def split_elements(chunks: list[Chunk], pages: dict[int, list[ParsedElement]]) -> int:
+    """Tables/lists that no single chunk of their page contains whole."""
+    by_page: dict[int, list[str]] = {}
+    for chunk in chunks:
+        by_page.setdefault(chunk.page_number, []).append(chunk.text)
+
+    split = 0
+    for page_num, elements in pages.items():
+        for elem in elements:
+            if elem.element_type in ATOMIC_TYPES and not any(
+                elem.text in text for text in by_page.get(page_num, [])
+            ):
+                split += 1
+    return split
+
+
+def main():
+    """Compare word and token/structure chunking on the parsed manual."""
+    parser = argparse.ArgumentParser(description="Benchmark chunking strategies")
+    parser.add_argument(
+        "--elements",
+        default=str(Path(settings.processed_chunks_path).parent / "parsed_elements.json"),
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.elements) as f:
+        elements = [ParsedElement(**item) for item in json.load(f)]
+    pages = group_elements_by_page(elements)
+    page_texts = group_by_page(elements)
+
+    token_chunker = TokenChunker(
+        settings.embedding_model,
+        chunk_tokens=settings.chunk_tokens,
+        overlap_tokens=settings.chunk_overlap_tokens,
+    )
+    strategies = {
+        f"words {settings.chunk_size}/{settings.chunk_overlap}": lambda: Chunker(
+            settings.chunk_size, settings.chunk_overlap
+        ).chunk_pages(page_texts),
+        f"tokens {settings.chunk_tokens}/{settings.chunk_overlap_tokens}": lambda: (
+            token_chunker.chunk_pages(pages)
+        ),
+    }
+
+    print("=" * 80)
+    print(f"CHUNKING ({len(pages)} pages, {len(elements)} elements)")
+    print("=" * 80)
+    print(
+        f"{'strategy':<18}{'chunks':>8}{'pages/s':>10}"
+        f"{'tok p50':>9}{'tok p95':>9}{'tok max':>9}{'over':>7}{'split':>7}"
+    )
+    for name, run in strategies.items():
+        seconds = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = run()
+            seconds.append(time.perf_counter() - start)
+
+        # Same tokenizer for both strategies, one batched call
+        lengths = np.array(
+            [len(ids) for ids in token_chunker.tokenizer([c.text for c in chunks])["input_ids"]]
+        )
+        print(
+            f"{name:<18}{len(chunks):>8}{len(pages) / np.median(seconds):>10.0f}"
+            f"{np.percentile(lengths, 50):>9.0f}{np.percentile(lengths, 95):>9.0f}"
+            f"{lengths.max():>9}"
+            f"{int((lengths > settings.embed_doc_max_length).sum()):>7}"
+            f"{split_elements(chunks, pages):>7}"
+        )
+    print("=" * 80)
+    print(
+        "tok: chunk length in embedding-model tokens; over: chunks truncated at "
+        "EMBED_DOC_MAX_LENGTH; split: tables/lists cut across chunks"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import chromadb
+from chromadb.config import Settings
+
+from src.config import settings
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_store import (
+    ChromaVectorStore,
+    MatrixVectorStore,
+    export_chroma_embeddings,
+)
+
+
+def measure(store, queries: np.ndarray, top_k: int) -> tuple[list[np.ndarray], list[float]]:
+    """Run queries one at a time; return result rows and per-query latency (ms)."""
+    rows, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result_rows, _ = store.search(query[None, :], top_k)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows.append(result_rows)
+    return rows, latencies
+
+
+def recall_at_k(results: list[np.ndarray], truth: list[np.ndarray], k: int) -> float:
+    """Mean overlap between result and exact top-k row sets."""
+    return float(
+        np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)])
+    )
+
+
+def main():
+    """Compare dense backends against exact search on the indexed chunks."""
+    parser = argparse.ArgumentParser(description="Benchmark dense search backends")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--ivf-nlist", type=int, default=16)
+    parser.add_argument("--ivf-nprobe", type=int, default=4)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    persist_dir = Path(settings.chroma_persist_dir)
+    lexical = LexicalIndex.open(persist_dir / "lexical")
+    chunk_ids = list(lexical.chunk_ids)
+    row_by_id = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+
+    client = chromadb.PersistentClient(
+        path=str(persist_dir), settings=Settings(anonymized_telemetry=False)
+    )
+    collection = client.get_collection("boeing_737")
+    embeddings = export_chroma_embeddings(collection, chunk_ids)
+    top_k = min(args.top_k, len(chunk_ids))
+
+    # Queries: perturbed chunk embeddings (close to real query/doc geometry)
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(embeddings), size=args.queries)
+    queries = embeddings[picks] + args.noise * rng.standard_normal(
+        (args.queries, embeddings.shape[1])
+    ).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        backends = {"chroma (hnsw)": ChromaVectorStore(collection, row_by_id)}
+        for dtype in ("float32", "float16", "int8"):
+            MatrixVectorStore.write(tmp_dir / dtype, embeddings, dtype=dtype)
+            backends[f"matrix {dtype}"] = MatrixVectorStore(tmp_dir / dtype)
+        MatrixVectorStore.write(
+            tmp_dir / "ivf", embeddings, dtype="float32", ivf_nlist=args.ivf_nlist
+        )
+        backends[f"matrix ivf{args.ivf_nlist}/{args.ivf_nprobe}"] = MatrixVectorStore(
+            tmp_dir / "ivf", nprobe=args.ivf_nprobe
+        )
+
+        truth, _ = measure(backends["matrix float32"], queries, top_k)
+
+        print("=" * 80)
+        print(
+            f"DENSE BACKENDS ({len(chunk_ids)} chunks, {args.queries} queries, "
+            f"top_k={top_k})"
+        )
+        print("=" * 80)
+        print(f"{'backend':<24}{'p50 ms':>10}{'p95 ms':>10}{'recall@10':>12}{'recall@k':>12}")
+        for name, store in backends.items():
+            results, latencies = measure(store, queries, top_k)
+            print(
+                f"{name:<24}{np.percentile(latencies, 50):>10.2f}"
+                f"{np.percentile(latencies, 95):>10.2f}"
+                f"{recall_at_k(results, truth, min(10, top_k)):>12.3f}"
+                f"{recall_at_k(results, truth, top_k):>12.3f}"
+            )
+        print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
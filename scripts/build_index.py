@@ -1,3 +1,4 @@
+import argparse
 import logging
 import sys
 from pathlib import Path
@@ -16,6 +17,13 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Build indices from processed chunks."""
+    parser = argparse.ArgumentParser(description="Build search indices")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every chunk into a new collection and swap it in when done",
+    )
+    args = parser.parse_args()
 
     # Load processed chunks
     chunks_path = Path(settings.processed_chunks_path)
@@ -32,9 +40,14 @@ def main():
     builder = IndexBuilder(
         persist_dir=settings.chroma_persist_dir,
         embedding_model=settings.embedding_model,
+        vector_backend=settings.vector_backend,
+        vector_dtype=settings.vector_dtype,
+        ivf_nlist=settings.vector_ivf_nlist,
+        doc_max_length=settings.embed_doc_max_length,
+        token_budget=settings.embed_token_budget,
     )
 
-    builder.build_indices(chunks)
+    diff = builder.build_indices(chunks, incremental=not args.full)
 
     # Print stats
     stats = builder.get_collection_stats()
@@ -42,6 +55,16 @@ def main():
     logger.info("INDEX BUILD COMPLETE")
     logger.info("=" * 50)
     logger.info(f"Total chunks indexed: {stats['total_chunks']}")
+    logger.info(
+        f"Added: {diff['added']}  Updated: {diff['updated']}  "
+        f"Deleted: {diff['deleted']}  Unchanged: {diff['unchanged']}"
+    )
+    if diff["embedding"]:
+        embed = diff["embedding"]
+        logger.info(
+            f"Embedding: {embed['tokens']} tokens in {embed['seconds']:.1f}s "
+            f"({embed['tokens_per_second']:.0f} tokens/s, {embed['batches']} batches)"
+        )
     logger.info(f"Collection: {stats['collection_name']}")
     logger.info(f"Location: {stats['persist_dir']}")
     logger.info("=" * 50)
@@ -8,11 +8,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.config import settings
 from src.generation.answer_generator import AnswerGenerator
+from src.retrieval.cascade import CandidatePruner, recall_at_cutoffs
 from src.retrieval.hybrid_search import HybridRetriever
 from src.retrieval.reranker import Reranker
 
 logging.basicConfig(level=logging.WARNING)
 
+# Candidate-list sizes at which cascade recall loss is reported
+CASCADE_CUTOFFS = [5, 10, 20, 30, 50, 100]
+
 # Test cases
 TESTS = [
     {
@@ -62,9 +66,21 @@ def main():
     """Run evaluation."""
 
     print("Initializing...")
-    retriever = HybridRetriever(settings.chroma_persist_dir, settings.embedding_model)
+    retriever = HybridRetriever(
+        settings.chroma_persist_dir,
+        settings.embedding_model,
+        vector_backend=settings.vector_backend,
+        ivf_nprobe=settings.vector_ivf_nprobe,
+    )
     reranker = Reranker(settings.reranker_model)
     generator = AnswerGenerator(settings.gemini_api_key)
+    pruner = CandidatePruner(
+        score_key=settings.cascade_score_key,
+        min_candidates=settings.cascade_min_candidates,
+        max_candidates=settings.cascade_max_candidates,
+        min_relative_score=settings.cascade_min_relative_score,
+        separation_ratio=settings.cascade_separation_ratio,
+    )
 
     print("\n" + "=" * 80)
     print("EVALUATION RESULTS")
@@ -74,6 +90,9 @@ def main():
     mrr_scores = []
     ndcg_scores = []
     total_relevant = total_returned = correct = 0
+    cascade_recalls: dict[int, list[float]] = {c: [] for c in CASCADE_CUTOFFS}
+    cascade_adaptive: list[float] = []
+    cascade_sizes: list[int] = []
 
     for i, test in enumerate(TESTS, 1):
         question = test["q"]
@@ -81,6 +100,22 @@ def main():
 
         # Retrieve
         results = retriever.search(question, top_k=100)
+
+        # Cascade: recall lost by cutting the cheap ordering at each size
+        for cutoff, recall in recall_at_cutoffs(
+            results, expected, CASCADE_CUTOFFS, score_key=pruner.score_key
+        ).items():
+            cascade_recalls[cutoff].append(recall)
+        pruned = pruner.prune(results)
+        cascade_sizes.append(len(pruned))
+        cascade_adaptive.append(
+            recall_at_cutoffs(
+                results, expected, [len(pruned)], score_key=pruner.score_key
+            )[len(pruned)]
+        )
+        if settings.cascade_enabled:
+            results = pruned
+
         reranked = reranker.rerank(question, results, top_k=20)
 
         # Get top 10
@@ -149,6 +184,21 @@ def main():
     print(f"Avg Pages/Query:  {total_returned / n:.1f}")
     print("=" * 80)
 
+    print(
+        f"CASCADE RECALL (score_key={pruner.score_key}, "
+        f"enabled={settings.cascade_enabled})"
+    )
+    print("=" * 80)
+    for cutoff in CASCADE_CUTOFFS:
+        recall = float(np.mean(cascade_recalls[cutoff]))
+        print(f"Top {cutoff:<4} recall: {recall:.1%}  (lost {1 - recall:.1%})")
+    adaptive = float(np.mean(cascade_adaptive))
+    print(
+        f"Adaptive:        {adaptive:.1%}  (lost {1 - adaptive:.1%}, "
+        f"avg {np.mean(cascade_sizes):.1f} candidates)"
+    )
+    print("=" * 80)
+
 
 if __name__ == "__main__":
     main()
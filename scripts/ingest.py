@@ -0,0 +1,114 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+from src.indexing.index_builder import IndexBuilder
+from src.ingestion.chunker import Chunker
+from src.ingestion.contextualizer import Contextualizer
+from src.ingestion.noise_filter import NoiseFilter
+from src.ingestion.pdf_parser import PDFParser
+from src.ingestion.streaming import IngestionPipeline
+from src.ingestion.token_chunker import TokenChunker
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Parse, chunk, contextualize and index the manual in one streaming run."""
+    parser = argparse.ArgumentParser(description="Ingest the manual end to end")
+    parser.add_argument(
+        "--pdf", default=settings.raw_pdf_path, help="PDF to ingest"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every chunk into a new collection and swap it in when done",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=settings.ingest_queue_size,
+        help="Items buffered between pipeline stages",
+    )
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    if not pdf_path.exists():
+        logger.error(f"PDF not found: {pdf_path}")
+        sys.exit(1)
+
+    pipeline = IngestionPipeline(
+        parser=PDFParser(
+            str(pdf_path),
+            workers=settings.pdf_parse_workers,
+            pages_per_task=settings.pdf_pages_per_task,
+            cache_dir=settings.pdf_page_cache_dir,
+            strategy=settings.pdf_parse_strategy,
+            noise_filter=(
+                NoiseFilter.from_file(settings.noise_patterns_path)
+                if settings.noise_patterns_path
+                else None
+            ),
+        ),
+        chunker=(
+            TokenChunker(
+                settings.embedding_model,
+                chunk_tokens=settings.chunk_tokens,
+                overlap_tokens=settings.chunk_overlap_tokens,
+            )
+            if settings.chunk_strategy == "tokens"
+            else Chunker(chunk_size=settings.chunk_size, overlap=settings.chunk_overlap)
+        ),
+        contextualizer=Contextualizer(
+            settings.gemini_api_key,
+            requests_per_minute=settings.context_requests_per_minute,
+            tokens_per_minute=settings.context_tokens_per_minute,
+            max_concurrency=settings.context_max_concurrency,
+            cache_path=settings.context_cache_path,
+        ),
+        builder=IndexBuilder(
+            persist_dir=settings.chroma_persist_dir,
+            embedding_model=settings.embedding_model,
+            vector_backend=settings.vector_backend,
+            vector_dtype=settings.vector_dtype,
+            ivf_nlist=settings.vector_ivf_nlist,
+            doc_max_length=settings.embed_doc_max_length,
+            token_budget=settings.embed_token_budget,
+        ),
+        queue_size=args.queue_size,
+        embed_batch_size=settings.ingest_embed_batch_size,
+        chunks_path=settings.processed_chunks_path,
+    )
+
+    stats = pipeline.run(incremental=not args.full)
+
+    logger.info("\n" + "=" * 50)
+    logger.info("INGESTION COMPLETE")
+    logger.info("=" * 50)
+    logger.info(
+        f"Pages: {stats['pages']}  Chunks: {stats['chunks']}  "
+        f"Time: {stats['seconds']:.1f}s"
+    )
+    logger.info(
+        f"Added: {stats['added']}  Updated: {stats['updated']}  "
+        f"Deleted: {stats['deleted']}  Unchanged: {stats['unchanged']}"
+    )
+    if stats["embedding"]:
+        embed = stats["embedding"]
+        logger.info(
+            f"Embedding: {embed['tokens']} tokens in {embed['seconds']:.1f}s "
+            f"({embed['tokens_per_second']:.0f} tokens/s, {embed['batches']} batches)"
+        )
+    logger.info(f"Location: {settings.chroma_persist_dir}")
+    logger.info("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from src.config import settings
 from src.ingestion.chunker import Chunker
 from src.ingestion.contextualizer import Contextualizer
-from src.ingestion.pdf_parser import PDFParser, group_by_page
+from src.ingestion.noise_filter import NoiseFilter
+from src.ingestion.pdf_parser import PDFParser, group_by_page, group_elements_by_page
+from src.ingestion.token_chunker import TokenChunker
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -20,26 +22,50 @@ def main():
         logger.error(f"PDF not found: {pdf_path}")
         sys.exit(1)
 
-    parser = PDFParser(str(pdf_path))
+    parser = PDFParser(
+        str(pdf_path),
+        workers=settings.pdf_parse_workers,
+        pages_per_task=settings.pdf_pages_per_task,
+        cache_dir=settings.pdf_page_cache_dir,
+        strategy=settings.pdf_parse_strategy,
+        noise_filter=(
+            NoiseFilter.from_file(settings.noise_patterns_path)
+            if settings.noise_patterns_path
+            else None
+        ),
+    )
     elements = parser.parse()
 
     parsed_path = Path(settings.processed_chunks_path).parent / "parsed_elements.json"
     parser.save(elements, str(parsed_path))
 
     # Group by page
-    pages = group_by_page(elements)
+    pages = group_elements_by_page(elements)
     logger.info(f"Grouped into {len(pages)} pages")
 
     # Create chunks
-    chunker = Chunker(chunk_size=settings.chunk_size, overlap=settings.chunk_overlap)
-    chunks = chunker.chunk_pages(pages)
+    if settings.chunk_strategy == "tokens":
+        chunks = TokenChunker(
+            settings.embedding_model,
+            chunk_tokens=settings.chunk_tokens,
+            overlap_tokens=settings.chunk_overlap_tokens,
+        ).chunk_pages(pages)
+    else:
+        chunker = Chunker(chunk_size=settings.chunk_size, overlap=settings.chunk_overlap)
+        chunks = chunker.chunk_pages(group_by_page(elements))
 
     # Add context
-    contextualizer = Contextualizer(settings.gemini_api_key)
+    contextualizer = Contextualizer(
+        settings.gemini_api_key,
+        requests_per_minute=settings.context_requests_per_minute,
+        tokens_per_minute=settings.context_tokens_per_minute,
+        max_concurrency=settings.context_max_concurrency,
+        cache_path=settings.context_cache_path,
+    )
     chunks = contextualizer.add_context(chunks)
 
     # Save
-    chunker.save(chunks, settings.processed_chunks_path)
+    Chunker.save(chunks, settings.processed_chunks_path)
 
     logger.info(
         f"✓ Complete: {len(chunks)} contextualized chunks from {len(pages)} pages"
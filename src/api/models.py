@@ -36,3 +36,110 @@ class QueryResponse(BaseModel):
                 "pages": [39, 51],
             }
         }
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for batch query endpoint."""
+
+    questions: list[str] = Field(
+        ...,
+        min_length=1,
+        description="Questions about Boeing 737 operations (validated per item)",
+    )
+
+    generate: bool = Field(
+        True,
+        description="Generate answers; if false, only the top pages are returned",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": [
+                    "What is the first action after positive rate of climb?",
+                    "When are the landing lights turned off after takeoff?",
+                ],
+                "generate": True,
+            }
+        }
+
+
+class BatchQueryItem(BaseModel):
+    """Result for one question of a batch (answer or error)."""
+
+    question: str
+
+    answer: str | None = Field(
+        None, description="Generated answer (null when not generated or on error)"
+    )
+
+    pages: list[int] = Field(
+        default_factory=list, description="Page numbers referenced (1-based PDF index)"
+    )
+
+    error: str | None = Field(None, description="Why this question failed, if it did")
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for batch query endpoint (results in request order)."""
+
+    results: list[BatchQueryItem]
+
+
+class SearchRequest(BaseModel):
+    """Request model for retrieval-only search endpoint."""
+
+    question: str = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Question about Boeing 737 operations",
+    )
+
+    top_k: int = Field(20, ge=1, le=100, description="Number of chunks to return")
+
+    rerank: bool = Field(
+        True,
+        description="Rerank with the cross-encoder; if false, rank by RRF (dense + BM25) only",
+    )
+
+    rerank_depth: int | None = Field(
+        None,
+        ge=1,
+        le=1000,
+        description="Fused candidates sent to the cross-encoder (default HYBRID_TOP_K)",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "question": "What does the amber STAIRS OPER light indicate?",
+                "top_k": 10,
+                "rerank": True,
+                "rerank_depth": 50,
+            }
+        }
+
+
+class SearchResult(BaseModel):
+    """One ranked chunk."""
+
+    chunk_id: str
+    page_number: int
+    text: str = Field(..., description="Chunk text (without generated context)")
+    rrf_score: float
+    rerank_score: float | None = Field(None, description="Null when not reranked")
+
+
+class SearchResponse(BaseModel):
+    """Response model for search endpoint."""
+
+    results: list[SearchResult]
+
+    pages: list[int] = Field(
+        ..., description="Most relevant page numbers (1-based PDF index)"
+    )
+
+    reranked: bool
+
+    took_ms: float
@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import logging
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import numpy as np
+
+from src.generation.answer_generator import AnswerGenerator
+from src.retrieval.cascade import CandidatePruner
+from src.retrieval.hybrid_search import HybridRetriever
+from src.retrieval.reranker import Reranker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class QueryPipeline:
+    """
+    Run the retrieve → rerank → generate stages off the event loop.
+
+    CPU-bound stages (query embedding + search, cross-encoder scoring) run on a
+    shared thread pool; torch releases the GIL during inference so they scale
+    with cores. Generation uses the async Gemini client. Every stage is capped
+    by its own semaphore so a burst on one stage cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        retriever: HybridRetriever,
+        reranker: Reranker,
+        generator: AnswerGenerator,
+        max_workers: int = 4,
+        retrieval_concurrency: int = 4,
+        rerank_concurrency: int = 2,
+        generation_concurrency: int = 16,
+        pruner: CandidatePruner | None = None,
+    ):
+        """
+        Initialize pipeline with loaded components and stage limits.
+        """
+        self.retriever = retriever
+        self.reranker = reranker
+        self.generator = generator
+        self.pruner = pruner
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rag-stage"
+        )
+        self._retrieval_slots = asyncio.Semaphore(retrieval_concurrency)
+        self._rerank_slots = asyncio.Semaphore(rerank_concurrency)
+        self._generation_slots = asyncio.Semaphore(generation_concurrency)
+
+        logger.info(
+            f"Query pipeline ready (workers={max_workers}, "
+            f"retrieval={retrieval_concurrency}, rerank={rerank_concurrency}, "
+            f"generation={generation_concurrency})"
+        )
+
+    async def _run_blocking(
+        self,
+        slots: asyncio.Semaphore,
+        func: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        """Run a blocking call on the executor once a stage slot is free."""
+        async with slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def embed(self, question: str) -> np.ndarray:
+        """Query embedding alone (e.g. for semantic cache lookups)."""
+        return await self._run_blocking(
+            self._retrieval_slots, self.retriever.embedder.embed_query, question
+        )
+
+    async def search(
+        self,
+        question: str,
+        top_k: int,
+        query_embedding: np.ndarray | None = None,
+    ) -> list[dict]:
+        """Hybrid retrieval (query embedding + dense/BM25 search)."""
+        return await self._run_blocking(
+            self._retrieval_slots,
+            self.retriever.search,
+            question,
+            top_k=top_k,
+            query_embedding=query_embedding,
+        )
+
+    async def rerank(
+        self, question: str, results: list[dict], top_k: int
+    ) -> list[dict]:
+        """Cross-encoder rerank of retrieved results (after optional cascade)."""
+        if self.pruner is not None:
+            results = self.pruner.prune(results)
+
+        return await self._run_blocking(
+            self._rerank_slots, self.reranker.rerank, question, results, top_k=top_k
+        )
+
+    async def search_batch(self, questions: list[str], top_k: int) -> list[list[dict]]:
+        """Hybrid retrieval for many questions (one embed + one search per index)."""
+        return await self._run_blocking(
+            self._retrieval_slots, self.retriever.search_batch, questions, top_k=top_k
+        )
+
+    async def rerank_batch(
+        self, questions: list[str], results_list: list[list[dict]], top_k: int
+    ) -> list[list[dict]]:
+        """Cross-encoder rerank for many questions in one scoring call."""
+        if self.pruner is not None:
+            results_list = [self.pruner.prune(results) for results in results_list]
+
+        return await self._run_blocking(
+            self._rerank_slots,
+            self.reranker.rerank_batch,
+            questions,
+            results_list,
+            top_k=top_k,
+        )
+
+    async def generate(
+        self,
+        question: str,
+        chunks: list[dict],
+        max_chunks: int = 5,
+        deadline: float | None = None,
+    ) -> tuple[str, list[int]]:
+        """LLM answer generation (within `deadline`, a `time.monotonic()` value)."""
+        async with self._generation_slots:
+            return await self.generator.generate_async(
+                question, chunks, max_chunks=max_chunks, deadline=deadline
+            )
+
+    async def generate_stream(
+        self,
+        question: str,
+        chunks: list[dict],
+        max_chunks: int = 5,
+        deadline: float | None = None,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Streaming LLM answer generation (holds a slot until the stream ends)."""
+        async with self._generation_slots:
+            async for event in self.generator.generate_stream(
+                question, chunks, max_chunks=max_chunks, deadline=deadline
+            ):
+                yield event
+
+    def shutdown(self) -> None:
+        """Release executor threads."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
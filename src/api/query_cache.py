@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from src.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Cached /query result: (answer, pages)
+Answer = tuple[str, list[int]]
+
+
+def normalize_question(question: str) -> str:
+    """Exact-match key: case, whitespace and trailing punctuation folded."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+class SemanticAnswerCache:
+    """
+    Fixed-capacity answer cache looked up by query-embedding similarity.
+
+    Normalized query embeddings live in one preallocated (max_size × dim)
+    matrix, so a lookup is a single matrix-vector product; the best match
+    is used if its cosine distance is within `max_distance` and it has not
+    expired. When full, the least recently used slot is overwritten.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        max_size: int = 10000,
+        ttl_seconds: float | None = None,
+        max_distance: float = 0.05,
+    ):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.min_similarity = 1.0 - max_distance
+
+        self._embeddings = np.zeros((self.max_size, dimension), dtype=np.float32)
+        self._answers: list[Answer | None] = [None] * self.max_size
+        self._stored_at = np.zeros(self.max_size, dtype=np.float64)
+        self._last_used = np.zeros(self.max_size, dtype=np.float64)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, embedding: np.ndarray) -> Answer | None:
+        """Answer of the most similar live entry within the distance, or None."""
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None
+
+            now = time.monotonic()
+            similarities = self._embeddings[: self._size] @ embedding
+            if self.ttl_seconds:
+                expired = now - self._stored_at[: self._size] > self.ttl_seconds
+                similarities[expired] = -np.inf
+
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.min_similarity:
+                self.misses += 1
+                return None
+
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._answers[slot]
+
+    def put(self, embedding: np.ndarray, answer: Answer) -> None:
+        """Store an answer, overwriting the least recently used slot when full."""
+        with self._lock:
+            if self._size < self.max_size:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            now = time.monotonic()
+            self._embeddings[slot] = embedding
+            self._answers[slot] = answer
+            self._stored_at[slot] = now
+            self._last_used[slot] = now
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._size = 0
+            self._answers = [None] * self.max_size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        """Cache counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class QueryCache:
+    """
+    Two-level /query answer cache.
+
+    Level one matches the normalized question text exactly; level two
+    (optional) reuses the answer of a previous question whose embedding is
+    within a cosine distance of the new one. Both levels are bounded, TTL +
+    LRU, and are dropped whenever the index version changes, so answers
+    never outlive the index they were generated from.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        max_size: int = 10000,
+        ttl_seconds: float | None = 3600.0,
+        semantic_max_distance: float = 0.05,
+    ):
+        self.exact: TTLCache[str, Answer] = TTLCache(max_size, ttl_seconds)
+        self.semantic = (
+            SemanticAnswerCache(dimension, max_size, ttl_seconds, semantic_max_distance)
+            if semantic_max_distance > 0
+            else None
+        )
+        self.index_version: str | None = None
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def sync_version(self, index_version: str) -> None:
+        """Drop every entry if the index changed since the answers were cached."""
+        with self._lock:
+            if index_version == self.index_version:
+                return
+            if self.index_version is not None:
+                logger.info(
+                    f"Index version changed ({self.index_version[:12]} → "
+                    f"{index_version[:12]}); clearing query cache"
+                )
+                self.invalidations += 1
+            self.exact.clear()
+            if self.semantic is not None:
+                self.semantic.clear()
+            self.index_version = index_version
+
+    def get_exact(self, question: str) -> Answer | None:
+        return self.exact.get(normalize_question(question))
+
+    def get_semantic(self, embedding: np.ndarray) -> Answer | None:
+        if self.semantic is None:
+            return None
+        return self.semantic.get(embedding)
+
+    def put(
+        self,
+        question: str,
+        embedding: np.ndarray | None,
+        answer: Answer,
+        index_version: str | None,
+    ) -> None:
+        """
+        Store an answer in both levels, unless it was generated from another
+        index version than the current one (the index was reloaded meanwhile).
+        """
+        with self._lock:
+            if index_version is None or index_version != self.index_version:
+                return
+        self.exact.put(normalize_question(question), answer)
+        if self.semantic is not None and embedding is not None:
+            self.semantic.put(embedding, answer)
+
+    def stats(self) -> dict:
+        """Per-level counters plus the overall hit rate."""
+        exact = self.exact.stats()
+        semantic = self.semantic.stats() if self.semantic is not None else None
+        hits = exact["hits"] + (semantic["hits"] if semantic else 0)
+        # Every request does an exact lookup; semantic lookups only follow exact misses
+        lookups = exact["hits"] + exact["misses"]
+        return {
+            "exact": exact,
+            "semantic": semantic,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "index_version": self.index_version,
+        }
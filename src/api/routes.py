@@ -1,11 +1,36 @@
+import asyncio
+import json
 import logging
+import threading
+import time
+from collections.abc import AsyncIterator
 
+import numpy as np
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 
-from src.api.models import QueryRequest, QueryResponse
+from src.api.models import (
+    BatchQueryItem,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    QueryRequest,
+    QueryResponse,
+    SearchRequest,
+    SearchResponse,
+    SearchResult,
+)
+from src.api.pipeline import QueryPipeline
+from src.api.query_cache import Answer, QueryCache
 from src.config import settings
 from src.generation.answer_generator import AnswerGenerator
+from src.generation.context_builder import ContextBuilder
+from src.generation.llm_client import DeadlineExceededError, create_llm_client
+from src.indexing.embedder import Embedder
+from src.retrieval.cascade import CandidatePruner
+from src.indexing.lexical_index import StaleIndexError
 from src.retrieval.hybrid_search import HybridRetriever
+from src.retrieval.page_aggregator import PageAggregator
 from src.retrieval.reranker import Reranker
 
 logger = logging.getLogger(__name__)
@@ -17,50 +42,312 @@ router = APIRouter()
 _retriever = None
 _reranker = None
 _generator = None
+_pipeline = None
+_query_cache = None
+
+# Guards component construction so concurrent cold requests load models once
+_init_lock = threading.RLock()
+# Serializes retriever reloads after the index on disk is rebuilt
+_reload_lock = threading.Lock()
+_ready = False
+
+# Background warm-up (started at startup and re-tried by /ready until it succeeds)
+_warmup_task: asyncio.Task | None = None
+_warmup_failed_at: float | None = None
+WARMUP_RETRY_SECONDS = 30.0
+
+WARMUP_QUERY = "What is the first action after positive rate of climb?"
 
 
 def get_retriever() -> HybridRetriever:
     """Lazy initialization of retriever."""
     global _retriever
-    if _retriever is None:
-        logger.info("Initializing retriever...")
-        _retriever = HybridRetriever(
-            persist_dir=settings.chroma_persist_dir,
-            embedding_model=settings.embedding_model,
-        )
+    with _init_lock:
+        if _retriever is None:
+            logger.info("Initializing retriever...")
+            embedder = Embedder(
+                settings.embedding_model,
+                use_fp16=False,
+                query_max_length=settings.query_max_length,
+                query_batch_window_ms=settings.embed_batch_window_ms,
+                query_max_batch_size=settings.embed_max_batch_size,
+            )
+            _retriever = HybridRetriever(
+                persist_dir=settings.chroma_persist_dir,
+                embedding_model=settings.embedding_model,
+                embedder=embedder,
+                verify_index=settings.index_verify_checksum,
+                vector_backend=settings.vector_backend,
+                ivf_nprobe=settings.vector_ivf_nprobe,
+            )
     return _retriever
 
 
 def get_reranker() -> Reranker:
     """Lazy initialization of reranker."""
     global _reranker
-    if _reranker is None:
-        logger.info("Initializing reranker...")
-        _reranker = Reranker(model_name=settings.reranker_model)
+    with _init_lock:
+        if _reranker is None:
+            logger.info("Initializing reranker...")
+            _reranker = Reranker(
+                model_name=settings.reranker_model,
+                cache_size=settings.rerank_cache_size,
+                cache_ttl_seconds=settings.rerank_cache_ttl_seconds,
+                batch_window_ms=settings.rerank_batch_window_ms,
+                max_batch_pairs=settings.rerank_max_batch_pairs,
+            )
     return _reranker
 
 
 def get_generator() -> AnswerGenerator:
     """Lazy initialization of generator."""
     global _generator
-    if _generator is None:
-        logger.info("Initializing generator...")
-        _generator = AnswerGenerator(api_key=settings.gemini_api_key)
+    with _init_lock:
+        if _generator is None:
+            logger.info("Initializing generator...")
+            _generator = AnswerGenerator(
+                client=create_llm_client(
+                    settings.llm_backend,
+                    api_key=settings.gemini_api_key,
+                    model_name=settings.llm_model,
+                    stub_latency_ms=settings.llm_stub_latency_ms,
+                    max_concurrency=settings.llm_max_concurrency,
+                    timeout_seconds=settings.llm_timeout_seconds,
+                    max_retries=settings.llm_max_retries,
+                    hedge=settings.llm_hedge_enabled,
+                    hedge_quantile=settings.llm_hedge_quantile,
+                    hedge_min_samples=settings.llm_hedge_min_samples,
+                ),
+                context_builder=(
+                    ContextBuilder(token_budget=settings.context_token_budget)
+                    if settings.context_compaction_enabled
+                    else None
+                ),
+            )
     return _generator
 
 
+def get_pruner() -> CandidatePruner | None:
+    """Build the rerank cascade pre-filter if enabled."""
+    if not settings.cascade_enabled:
+        return None
+    return CandidatePruner(
+        score_key=settings.cascade_score_key,
+        min_candidates=settings.cascade_min_candidates,
+        max_candidates=settings.cascade_max_candidates,
+        min_relative_score=settings.cascade_min_relative_score,
+        separation_ratio=settings.cascade_separation_ratio,
+    )
+
+
+def get_pipeline() -> QueryPipeline:
+    """Lazy initialization of the async query pipeline."""
+    global _pipeline
+    with _init_lock:
+        if _pipeline is None:
+            _pipeline = QueryPipeline(
+                retriever=get_retriever(),
+                reranker=get_reranker(),
+                generator=get_generator(),
+                max_workers=settings.executor_max_workers,
+                retrieval_concurrency=settings.retrieval_concurrency,
+                rerank_concurrency=settings.rerank_concurrency,
+                generation_concurrency=settings.generation_concurrency,
+                pruner=get_pruner(),
+            )
+    return _pipeline
+
+
+def get_query_cache() -> QueryCache | None:
+    """Lazy initialization of the /query answer cache (None if disabled)."""
+    global _query_cache
+    if not settings.query_cache_enabled:
+        return None
+    with _init_lock:
+        if _query_cache is None:
+            _query_cache = QueryCache(
+                dimension=get_retriever().embedder.dimension,
+                max_size=settings.query_cache_size,
+                ttl_seconds=settings.query_cache_ttl_seconds,
+                semantic_max_distance=settings.query_cache_semantic_distance,
+            )
+    return _query_cache
+
+
+async def acquire_pipeline() -> QueryPipeline:
+    """
+    Return the pipeline, loading it off the event loop if warm-up has not run.
+
+    A pipeline loaded here serves queries, so the instance is ready from
+    then on even if warm-up was skipped or failed.
+    """
+    global _ready
+    if _pipeline is not None:
+        return _pipeline
+    pipeline = await asyncio.to_thread(get_pipeline)
+    _ready = True
+    return pipeline
+
+
+def warm_up() -> None:
+    """
+    Load every component and run a dummy embed + rerank.
+
+    Runs in the background (see `start_warm_up`) so the first real query is
+    served at steady-state latency; /ready reports true once this completes.
+    """
+    global _ready
+    start = time.perf_counter()
+
+    pipeline = get_pipeline()
+
+    logger.info("Warming up embedding model and indices...")
+    results = pipeline.retriever.search(WARMUP_QUERY, top_k=settings.hybrid_top_k)
+
+    logger.info("Warming up reranker...")
+    pipeline.reranker.rerank(WARMUP_QUERY, results, top_k=settings.rerank_top_k)
+
+    _ready = True
+    logger.info(f"✓ Warm-up complete in {time.perf_counter() - start:.1f}s")
+
+
+async def _run_warm_up() -> None:
+    global _warmup_failed_at
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        _warmup_failed_at = time.monotonic()
+        logger.error(
+            f"Warm-up failed, retrying on a readiness check in "
+            f"{WARMUP_RETRY_SECONDS:.0f}s: {e}",
+            exc_info=True,
+        )
+
+
+def start_warm_up() -> None:
+    """
+    Start warm-up in the background unless the instance is ready, warm-up
+    is running, or it failed less than WARMUP_RETRY_SECONDS ago.
+
+    Called at startup (WARMUP_ON_STARTUP) and by /ready, so readiness never
+    depends on the startup hook alone and a failed warm-up is retried.
+    """
+    global _warmup_task
+    if _ready or (_warmup_task is not None and not _warmup_task.done()):
+        return
+    if (
+        _warmup_failed_at is not None
+        and time.monotonic() - _warmup_failed_at < WARMUP_RETRY_SECONDS
+    ):
+        return
+    _warmup_task = asyncio.create_task(_run_warm_up())
+
+
+def is_ready() -> bool:
+    """Whether the instance has finished warm-up."""
+    return _ready
+
+
+def shutdown() -> None:
+    """Release pipeline resources."""
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    if _pipeline is not None:
+        _pipeline.shutdown()
+
+
+def refresh_index(pipeline: QueryPipeline) -> str | None:
+    """
+    Swap a fresh retriever into the pipeline if the indices on disk changed.
+
+    In-flight searches finish on the old retriever. Returns the version of
+    the index now served, or None if the rebuilt index cannot be loaded yet
+    (still being written); answers must not be cached then.
+    """
+    global _retriever
+    retriever = pipeline.retriever
+    if not retriever.is_stale():
+        return retriever.version
+
+    with _reload_lock:
+        if pipeline.retriever is retriever:
+            try:
+                fresh = retriever.reload()
+            except StaleIndexError as e:
+                logger.warning(f"Index on disk changed but cannot be loaded yet: {e}")
+                return None
+            pipeline.retriever = fresh
+            with _init_lock:
+                _retriever = fresh
+            logger.info(f"Reloaded retriever for index version {fresh.version[:12]}")
+        return pipeline.retriever.version
+
+
+async def sync_index(pipeline: QueryPipeline) -> str | None:
+    """
+    Reload the retriever after a rebuild and drop answers and rerank scores
+    cached from the previous index; returns the served index version (see
+    `refresh_index`).
+    """
+    index_version = await asyncio.to_thread(refresh_index, pipeline)
+    if index_version is None:
+        return None
+    if pipeline.reranker is not None:
+        pipeline.reranker.sync_version(index_version)
+    cache = get_query_cache()
+    if cache is not None:
+        cache.sync_version(index_version)
+    return index_version
+
+
+async def _lookup_cache(
+    cache: QueryCache | None,
+    pipeline: QueryPipeline,
+    question: str,
+    index_version: str | None,
+) -> tuple[Answer | None, np.ndarray | None]:
+    """
+    Cached answer for a question: exact match first, then a semantically
+    close one. Also returns the query embedding if one was computed, so
+    retrieval can reuse it on a miss.
+    """
+    if cache is None or index_version is None:
+        return None, None
+
+    cached = cache.get_exact(question)
+    if cached is not None or cache.semantic is None:
+        return cached, None
+
+    query_embedding = await pipeline.embed(question)
+    return cache.get_semantic(query_embedding), query_embedding
+
+
 @router.post("/query", response_model=QueryResponse)
 async def query_manual(request: QueryRequest) -> QueryResponse:
     """
     Query the Boeing 737 Operations Manual.
     """
     try:
+        deadline = time.monotonic() + settings.request_budget_seconds
         question = request.question
         logger.info(f"Query received: '{question[:100]}...'")
 
+        pipeline = await acquire_pipeline()
+        index_version = await sync_index(pipeline)
+
+        cache = get_query_cache()
+        cached, query_embedding = await _lookup_cache(
+            cache, pipeline, question, index_version
+        )
+        if cached is not None:
+            answer, pages = cached
+            logger.info(f"Query answered from cache. Pages: {pages}")
+            return QueryResponse(answer=answer, pages=pages)
+
         # Retrieve
-        retriever = get_retriever()
-        results = retriever.search(question, top_k=settings.hybrid_top_k)
+        results = await pipeline.search(
+            question, top_k=settings.hybrid_top_k, query_embedding=query_embedding
+        )
 
         if not results:
             return QueryResponse(
@@ -68,23 +355,316 @@ async def query_manual(request: QueryRequest) -> QueryResponse:
             )
 
         # Rerank
-        reranker = get_reranker()
-        reranked = reranker.rerank(question, results, top_k=settings.rerank_top_k)
+        reranked = await pipeline.rerank(question, results, top_k=settings.rerank_top_k)
 
         # Generate answer
-        generator = get_generator()
-        answer, pages = generator.generate(question, reranked, max_chunks=5)
+        answer, pages = await pipeline.generate(
+            question, reranked, max_chunks=5, deadline=deadline
+        )
 
         logger.info(f"Query processed successfully. Pages: {pages}")
 
+        if cache is not None:
+            cache.put(question, query_embedding, (answer, pages), index_version)
+
         return QueryResponse(answer=answer, pages=pages)
 
+    except DeadlineExceededError as e:
+        logger.error(f"Query timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Query timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+async def _retrieve_one(pipeline: QueryPipeline, question: str) -> list[dict]:
+    """Search + rerank for a single question (batch fallback path)."""
+    results = await pipeline.search(question, top_k=settings.hybrid_top_k)
+    return await pipeline.rerank(question, results, top_k=settings.rerank_top_k)
+
+
+async def _retrieve_batch(
+    pipeline: QueryPipeline, questions: list[str]
+) -> list[list[dict] | BaseException]:
+    """
+    Search + rerank for many questions with shared model calls. If the
+    batched call fails, each question is retried on its own so one bad
+    item only fails itself.
+    """
+    if not questions:
+        return []
+
+    try:
+        results_list = await pipeline.search_batch(
+            questions, top_k=settings.hybrid_top_k
+        )
+        return await pipeline.rerank_batch(
+            questions, results_list, top_k=settings.rerank_top_k
+        )
+    except Exception as e:
+        logger.warning(f"Batch retrieval failed ({e}); retrying per question")
+        return await asyncio.gather(
+            *(_retrieve_one(pipeline, question) for question in questions),
+            return_exceptions=True,
+        )
+
+
+async def _answer(
+    pipeline: QueryPipeline, question: str, reranked: list[dict]
+) -> Answer:
+    """Generate one answer (empty retrieval gets the standard reply)."""
+    if not reranked:
+        return "No relevant information found in the manual.", []
+    return await pipeline.generate(question, reranked, max_chunks=5)
+
+
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_manual_batch(request: BatchQueryRequest) -> BatchQueryResponse:
+    """
+    Query the manual with many questions at once.
+
+    Embedding, search and rerank are shared across the batch; generation
+    (optional) runs concurrently within the generation limit. Each item
+    carries its own answer or error, so one failure never fails the batch.
+    """
+    if len(request.questions) > settings.query_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.query_batch_max_size} questions",
+        )
+
+    logger.info(
+        f"Batch query received: {len(request.questions)} questions "
+        f"(generate={request.generate})"
+    )
+    items = [BatchQueryItem(question=question) for question in request.questions]
+
+    # Same per-question validation as /query
+    pending: list[BatchQueryItem] = []
+    for item in items:
+        try:
+            QueryRequest(question=item.question)
+            pending.append(item)
+        except ValidationError as e:
+            item.error = f"Invalid question: {e.errors()[0]['msg']}"
+
+    try:
+        pipeline = await acquire_pipeline()
+        index_version = await sync_index(pipeline)
+    except Exception as e:
+        logger.error(f"Error loading pipeline: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+    cache = get_query_cache() if request.generate else None
+    if cache is not None and index_version is not None:
+        uncached = []
+        for item in pending:
+            cached = cache.get_exact(item.question)
+            if cached is None:
+                uncached.append(item)
+            else:
+                item.answer, item.pages = cached
+        pending = uncached
+
+    retrieved = await _retrieve_batch(pipeline, [item.question for item in pending])
+
+    to_generate: list[tuple[BatchQueryItem, list[dict]]] = []
+    for item, reranked in zip(pending, retrieved):
+        if isinstance(reranked, BaseException):
+            item.error = f"Error processing query: {str(reranked)}"
+        elif request.generate:
+            to_generate.append((item, reranked))
+        else:
+            item.pages = PageAggregator.extract_pages(
+                reranked, max_pages=settings.max_pages_default
+            )
+
+    answers = await asyncio.gather(
+        *(_answer(pipeline, item.question, reranked) for item, reranked in to_generate),
+        return_exceptions=True,
+    )
+    for (item, _), answer in zip(to_generate, answers):
+        if isinstance(answer, BaseException):
+            logger.error(f"Error generating answer for '{item.question[:50]}': {answer}")
+            item.error = f"Error processing query: {str(answer)}"
+            continue
+        item.answer, item.pages = answer
+        if cache is not None:
+            cache.put(item.question, None, answer, index_version)
+
+    failed = sum(item.error is not None for item in items)
+    logger.info(f"Batch query processed: {len(items) - failed} ok, {failed} failed")
+    return BatchQueryResponse(results=items)
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search_manual(request: SearchRequest) -> SearchResponse:
+    """
+    Retrieval only: ranked chunks and pages, no answer generation.
+
+    Hybrid search, then (unless `rerank` is false) the cross-encoder over
+    the top `rerank_depth` fused candidates. Without rerank the fused list
+    is cut to `top_k` and pages are ranked by RRF score.
+    """
+    try:
+        start = time.perf_counter()
+        question = request.question
+        logger.info(f"Search received: '{question[:100]}...'")
+
+        pipeline = await acquire_pipeline()
+        await sync_index(pipeline)
+
+        if request.rerank:
+            depth = max(request.rerank_depth or settings.hybrid_top_k, request.top_k)
+            results = await pipeline.search(question, top_k=depth)
+            ranked = await pipeline.rerank(question, results, top_k=request.top_k)
+            pages = PageAggregator.extract_pages_with_confidence(
+                ranked,
+                confidence_threshold=settings.confidence_threshold,
+                max_pages=settings.max_pages_default,
+            )
+        else:
+            # Fuse over the usual candidate depth; a shallow search skews RRF
+            depth = max(settings.hybrid_top_k, request.top_k)
+            results = await pipeline.search(question, top_k=depth)
+            ranked = results[: request.top_k]
+            pages = PageAggregator.extract_pages(
+                ranked, max_pages=settings.max_pages_default, score_key="rrf_score"
+            )
+
+        took_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Search processed in {took_ms:.0f} ms. Pages: {pages}")
+
+        return SearchResponse(
+            results=[
+                SearchResult(
+                    chunk_id=result["chunk_id"],
+                    page_number=result["page_number"],
+                    text=result["original_text"],
+                    rrf_score=result["rrf_score"],
+                    rerank_score=result.get("rerank_score"),
+                )
+                for result in ranked
+            ],
+            pages=pages,
+            reranked=request.rerank,
+            took_ms=took_ms,
+        )
+
+    except Exception as e:
+        logger.error(f"Error processing search: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing search: {str(e)}")
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_answer(question: str) -> AsyncIterator[str]:
+    """
+    SSE events for one question: "pages" (candidates after rerank; always
+    sent first), "token" (answer text as it is generated), then "done"
+    (answer and cited pages).
+    """
+    try:
+        deadline = time.monotonic() + settings.request_budget_seconds
+        pipeline = await acquire_pipeline()
+        index_version = await sync_index(pipeline)
+
+        cache = get_query_cache()
+        cached, query_embedding = await _lookup_cache(
+            cache, pipeline, question, index_version
+        )
+        if cached is not None:
+            answer, pages = cached
+            # No candidates were ranked: the cached cited pages stand in for them
+            yield _sse("pages", {"pages": pages})
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {"answer": answer, "pages": pages})
+            return
+
+        results = await pipeline.search(
+            question, top_k=settings.hybrid_top_k, query_embedding=query_embedding
+        )
+        if not results:
+            answer = "No relevant information found in the manual."
+            yield _sse("pages", {"pages": []})
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {"answer": answer, "pages": []})
+            return
+
+        reranked = await pipeline.rerank(question, results, top_k=settings.rerank_top_k)
+        candidate_pages = PageAggregator.extract_pages(
+            reranked, max_pages=settings.max_pages_default
+        )
+        yield _sse("pages", {"pages": candidate_pages})
+
+        async for event, data in pipeline.generate_stream(
+            question, reranked, max_chunks=5, deadline=deadline
+        ):
+            if event == "token":
+                yield _sse("token", {"text": data})
+            else:
+                answer, pages = data
+                logger.info(f"Streamed query processed successfully. Pages: {pages}")
+                if cache is not None:
+                    cache.put(question, query_embedding, (answer, pages), index_version)
+                yield _sse("done", {"answer": answer, "pages": pages})
+
+    except Exception as e:
+        # Headers are already sent: report the failure as an event
+        logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+        yield _sse("error", {"detail": f"Error processing query: {str(e)}"})
+
+
+@router.post("/query/stream")
+async def query_manual_stream(request: QueryRequest) -> StreamingResponse:
+    """
+    Query the manual and stream the answer as Server-Sent Events.
+    """
+    logger.info(f"Streaming query received: '{request.question[:100]}...'")
+    return StreamingResponse(
+        _stream_answer(request.question),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "boeing-737-rag"}
+
+
+@router.get("/stats")
+async def stats():
+    """Cache and batching counters for the loaded components."""
+    result: dict = {}
+    if _retriever is not None:
+        result["query_embedding"] = {
+            "batching": _retriever.embedder.query_batcher.stats()
+        }
+    if _reranker is not None:
+        result["rerank"] = _reranker.stats()
+    if _query_cache is not None:
+        result["query_cache"] = _query_cache.stats()
+    if _generator is not None:
+        result["llm"] = _generator.client.stats()
+        if _generator.context_builder is not None:
+            result["context"] = _generator.context_builder.stats()
+    return result
+
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint: 200 only once models are loaded and warmed up.
+    While unready it (re)starts warm-up in the background.
+    """
+    if not is_ready():
+        start_warm_up()
+        return JSONResponse(
+            status_code=503, content={"status": "warming_up", "ready": False}
+        )
+    return {"status": "ready", "ready": True}
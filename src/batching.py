@@ -0,0 +1,133 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _BatchRequest(Generic[T, R]):
+    """Items submitted by one caller and the future it waits on."""
+
+    items: list[T]
+    future: "Future[list[R]]" = field(default_factory=Future)
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesce concurrent calls into batched invocations of `process`.
+
+    Callers block in `submit`/`submit_many` while a background thread drains
+    the queue: after the first pending request it keeps collecting for up to
+    `max_wait_ms` (or until `max_batch_size` items are queued), runs one
+    batched `process` call and hands each caller back its own slice.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list[T]], Sequence[R]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+    ):
+        """
+        Initialize batcher (the worker thread starts on first submit).
+        """
+        self.process = process
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: queue.Queue[_BatchRequest[T, R]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: T) -> R:
+        """Submit one item and block until its result is ready."""
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: list[T]) -> list[R]:
+        """Submit several items; they are kept together in a single batch."""
+        if not items:
+            return []
+
+        request: _BatchRequest[T, R] = _BatchRequest(items=list(items))
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future.result()
+
+    def stats(self) -> dict:
+        """Batching counters."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        """Start the background worker once."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Collect pending requests into batches forever."""
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].items)
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        request = self._queue.get(timeout=remaining)
+                    else:
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.items)
+
+            self._process_batch(batch)
+
+    def _process_batch(self, batch: list[_BatchRequest[T, R]]) -> None:
+        """Run one batched call and distribute results to callers."""
+        items = [item for request in batch for item in request.items]
+
+        try:
+            results = list(self.process(items))
+            if len(results) != len(items):
+                raise ValueError(
+                    f"expected {len(items)} results, got {len(results)}"
+                )
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(items)
+
+        offset = 0
+        for request in batch:
+            count = len(request.items)
+            request.future.set_result(results[offset : offset + count])
+            offset += count
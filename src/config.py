@@ -1,3 +1,4 @@
+import os
 
 from pydantic_settings import BaseSettings
 
@@ -12,25 +13,101 @@ class Settings(BaseSettings):
     embedding_model: str = "BAAI/bge-m3"
     reranker_model: str = "BAAI/bge-reranker-v2-m3"
 
+    # Query Embedding Configuration
+    query_max_length: int = 512
+    embed_batch_window_ms: float = 5.0
+    embed_max_batch_size: int = 16
+
+    # Reranker Configuration
+    rerank_cache_size: int = 50000
+    rerank_cache_ttl_seconds: float = 3600.0
+    rerank_batch_window_ms: float = 5.0
+    rerank_max_batch_pairs: int = 256
+
+    # Query Answer Cache Configuration (/query)
+    query_cache_enabled: bool = True
+    query_cache_size: int = 10000
+    query_cache_ttl_seconds: float = 3600.0
+    query_cache_semantic_distance: float = 0.0  # cosine distance; 0 disables
+
+    # LLM Generation Configuration
+    llm_backend: str = "gemini"  # gemini | stub (offline, canned answers)
+    llm_model: str = "gemini-2.5-flash"
+    llm_max_concurrency: int = 16  # upstream calls in flight, hedges included
+    llm_timeout_seconds: float = 20.0  # per call, capped by the request budget
+    llm_max_retries: int = 2
+    llm_hedge_enabled: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_samples: int = 50
+    llm_stub_latency_ms: float = 200.0
+    request_budget_seconds: float = 30.0  # end-to-end deadline for /query
+    context_compaction_enabled: bool = True  # merge/dedupe chunks before prompting
+    context_token_budget: int = 2000  # prompt context tokens (~4 chars each)
+
+    # Rerank Cascade Configuration
+    cascade_enabled: bool = False
+    cascade_score_key: str = "rrf_score"
+    cascade_min_candidates: int = 10
+    cascade_max_candidates: int = 50
+    cascade_min_relative_score: float = 0.0
+    cascade_separation_ratio: float = 0.25
+
+    # Document Embedding Configuration (index builds)
+    embed_doc_max_length: int = 1024
+    embed_token_budget: int = 16384
+
+    # PDF Parsing Configuration
+    pdf_parse_strategy: str = "auto"  # auto | fast | hi_res | ocr_only
+    pdf_parse_workers: int = 4
+    pdf_pages_per_task: int = 8
+    pdf_page_cache_dir: str = "./data/processed/page_cache"
+    noise_patterns_path: str = ""  # per-document rules JSON; empty = built-in
+
+    # Streaming Ingestion Configuration (scripts/ingest.py)
+    ingest_queue_size: int = 64
+    ingest_embed_batch_size: int = 256
+
     # Chunking Configuration
-    chunk_size: int = 400
-    chunk_overlap: int = 50
+    chunk_strategy: str = "tokens"  # tokens (structure-aware) | words
+    chunk_tokens: int = 384
+    chunk_overlap_tokens: int = 48
+    chunk_size: int = 400  # words strategy
+    chunk_overlap: int = 50  # words strategy
+
+    # Contextualization Configuration
+    context_requests_per_minute: int = 50
+    context_tokens_per_minute: int = 1_000_000
+    context_max_concurrency: int = 8
 
     # Retrieval Configuration
     hybrid_top_k: int = 100
     rerank_top_k: int = 20
     confidence_threshold: float = 0.6
     max_pages_default: int = 5
+    query_batch_max_size: int = 5000  # questions per /query/batch request
+
+    # Concurrency Configuration
+    executor_max_workers: int = os.cpu_count() or 4
+    retrieval_concurrency: int = 4
+    rerank_concurrency: int = 2
+    generation_concurrency: int = 16
 
     # Storage Paths
     chroma_persist_dir: str = "./data/processed/chroma_db"
+    index_verify_checksum: bool = False  # sha256 every index file at load (slow)
+    vector_backend: str = "chroma"  # chroma | matrix
+    vector_dtype: str = "float32"  # float32 | float16 | int8 (matrix backend)
+    vector_ivf_nlist: int = 0  # 0 = exact search
+    vector_ivf_nprobe: int = 8
     raw_pdf_path: str = "./data/raw/boeing_737_manual.pdf"
-    processed_chunks_path: str = "./data/processed/chunks.json"
+    processed_chunks_path: str = "./data/processed/chunks.jsonl"
+    context_cache_path: str = "./data/processed/context_cache.sqlite"
 
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
     log_level: str = "INFO"
+    warmup_on_startup: bool = True
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,71 @@
 import logging
 import re
 import textwrap
+from collections.abc import AsyncIterator
+from typing import Any
 
-import google.generativeai as genai
+from src.generation.context_builder import ContextBuilder
+from src.generation.llm_client import ResilientLLMClient, create_llm_client
 
 logger = logging.getLogger(__name__)
 
+# Text that may still grow into a citation: "[", "[Doc", "[Document 1, 2", ...
+CITATION_PREFIX = re.compile(
+    r"\[(?:D(?:o(?:c(?:u(?:m(?:e(?:n(?:t[\sDocument\d,]*)?)?)?)?)?)?)?)?"
+)
+
+
+class CitationStripper:
+    """
+    Incremental equivalent of stripping citations from a finished answer.
+
+    Streamed text is released as soon as it can no longer be part of a
+    citation: a trailing "[" that could still grow into "[Document N]"
+    is held back unstripped, as is trailing whitespace (the space before a
+    citation is removed with it). Citations are removed from raw text only,
+    once; whitespace left at the end of the stripped text is held until
+    more text follows, and the answer's final whitespace is dropped.
+    `raw` keeps the unstripped text for citation extraction.
+    """
+
+    def __init__(self, citation_pattern: str):
+        self._citation = re.compile(r" ?" + citation_pattern)
+        self._pending = ""  # raw text not yet stripped
+        self._held = ""  # stripped trailing whitespace not yet emitted
+        self.raw = ""
+        self.text = ""
+
+    def feed(self, delta: str) -> str:
+        """Add streamed text; return the part that is safe to emit."""
+        self.raw += delta
+        pending = self._pending + delta
+
+        cut = len(pending)
+        bracket = pending.rfind("[")
+        if bracket != -1 and CITATION_PREFIX.fullmatch(pending, bracket):
+            cut = bracket
+        while cut > 0 and pending[cut - 1].isspace():
+            cut -= 1
+        self._pending = pending[cut:]
+
+        text = self._held + self._citation.sub("", pending[:cut])
+        emit = text.rstrip()
+        self._held = text[len(emit) :]
+        return self._emit(emit)
+
+    def finish(self) -> str:
+        """Flush held text at the end of the stream (without trailing space)."""
+        text = (self._held + self._citation.sub("", self._pending)).rstrip()
+        self._pending = ""
+        self._held = ""
+        return self._emit(text)
+
+    def _emit(self, text: str) -> str:
+        if not self.text:
+            text = text.lstrip()
+        self.text += text
+        return text
+
 
 class AnswerGenerator:
     """
@@ -14,37 +74,135 @@ class AnswerGenerator:
 
     CITATION_PATTERN = r'\[Document\s+\d+(?:(?:,\s*(?:Document\s+)?\d+)*)\]'
 
-    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str = "gemini-2.5-flash",
+        client: ResilientLLMClient | None = None,
+        context_builder: ContextBuilder | None = None,
+    ):
         """
-        Initialize answer generator.
+        Initialize answer generator (pass `client` for another backend or limits).
+
+        With a `context_builder`, retrieved chunks are compacted before
+        prompting; without one they are used verbatim.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
-        logger.info(f"Answer generator ready (model={model_name})")
+        self.client = client or create_llm_client(
+            "gemini", api_key=api_key, model_name=model_name
+        )
+        self.context_builder = context_builder
+        logger.info(f"Answer generator ready (model={self.client.model_name})")
 
     def generate(
         self,
         query: str,
         retrieved_chunks: list[dict],
         max_chunks: int = 5,
+        deadline: float | None = None,
     ) -> tuple[str, list[int]]:
         """
-        Generate answer from retrieved context.
+        Generate answer from retrieved context (blocking, for scripts).
         """
         if not retrieved_chunks:
             return self._no_results_response(query)
 
         # Select top chunks
-        top_chunks = retrieved_chunks[:max_chunks]
+        top_chunks = self._select_context(query, retrieved_chunks[:max_chunks])
 
         # Build prompt
         prompt = self._build_prompt(query, top_chunks)
 
         # Generate answer
         logger.info(f"Generating answer for: '{query[:50]}...'")
-        response = self.model.generate_content(prompt)
-        answer = response.text.strip()
-        cited_pages = self._extract_cited_pages(answer, top_chunks)
+        raw_answer = self.client.generate_blocking(prompt, deadline=deadline)
+        return self._finalize_answer(raw_answer, top_chunks)
+
+    async def generate_async(
+        self,
+        query: str,
+        retrieved_chunks: list[dict],
+        max_chunks: int = 5,
+        deadline: float | None = None,
+    ) -> tuple[str, list[int]]:
+        """
+        Generate answer without blocking the event loop.
+
+        `deadline` (`time.monotonic()`) is the point by which the answer is
+        needed; the LLM call's timeout and retries are fitted into it.
+        """
+        if not retrieved_chunks:
+            return self._no_results_response(query)
+
+        top_chunks = self._select_context(query, retrieved_chunks[:max_chunks])
+        prompt = self._build_prompt(query, top_chunks)
+
+        logger.info(f"Generating answer (async) for: '{query[:50]}...'")
+        raw_answer = await self.client.generate(prompt, deadline=deadline)
+        return self._finalize_answer(raw_answer, top_chunks)
+
+    async def generate_stream(
+        self,
+        query: str,
+        retrieved_chunks: list[dict],
+        max_chunks: int = 5,
+        deadline: float | None = None,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Stream the answer as ("token", text) events with citations stripped,
+        followed by one ("done", (answer, cited_pages)) event.
+        """
+        if not retrieved_chunks:
+            answer, pages = self._no_results_response(query)
+            yield "token", answer
+            yield "done", (answer, pages)
+            return
+
+        top_chunks = self._select_context(query, retrieved_chunks[:max_chunks])
+        prompt = self._build_prompt(query, top_chunks)
+
+        logger.info(f"Generating answer (stream) for: '{query[:50]}...'")
+        stripper = CitationStripper(self.CITATION_PATTERN)
+        async for delta in self.client.stream(prompt, deadline=deadline):
+            text = stripper.feed(delta)
+            if text:
+                yield "token", text
+
+        tail = stripper.finish()
+        if tail:
+            yield "token", tail
+
+        cited_pages = self._extract_cited_pages(stripper.raw.strip(), top_chunks)
+        logger.info(f"Streamed answer with {len(cited_pages)} page citations")
+        yield "done", (stripper.text, cited_pages)
+
+    def _select_context(self, query: str, chunks: list[dict]) -> list[dict]:
+        """
+        Context documents for the prompt (compacted if a builder is set).
+        Citations are mapped back to pages through these documents.
+        """
+        if self.context_builder is None:
+            return chunks
+
+        documents, report = self.context_builder.build(chunks)
+        if not documents:
+            return chunks
+        logger.info(
+            f"Context for '{query[:50]}': {report.chunks} chunks → "
+            f"{report.documents} documents, {report.original_tokens} → "
+            f"{report.context_tokens} tokens ({report.tokens_saved} saved; "
+            f"{report.merged_chunks} merged, {report.duplicate_sentences} duplicate "
+            f"sentences{', truncated' if report.truncated else ''})"
+        )
+        return documents
+
+    def _finalize_answer(
+        self, raw_answer: str, chunks: list[dict]
+    ) -> tuple[str, list[int]]:
+        """
+        Map citations to pages and strip them from the answer text.
+        """
+        answer = raw_answer.strip()
+        cited_pages = self._extract_cited_pages(answer, chunks)
         answer = re.sub(r" ?" + self.CITATION_PATTERN, "", answer).strip()
 
         logger.info(f"Generated answer with {len(cited_pages)} page citations")
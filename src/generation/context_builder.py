@@ -0,0 +1,235 @@
+import re
+import threading
+from dataclasses import dataclass
+
+# Chunk ids are "p{page}_c{index}"; consecutive indices are neighbours on the page
+CHUNK_INDEX = re.compile(r"_c(\d+)$")
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\S+")
+
+# Shortest word run accepted as a chunk overlap (word chunker overlaps 50 words)
+MIN_OVERLAP_WORDS = 5
+
+# A truncated document shorter than this is dropped instead
+MIN_TRUNCATED_TOKENS = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token, as the rate limiter assumes)."""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class ContextReport:
+    """What context assembly did for one query."""
+
+    chunks: int
+    documents: int
+    merged_chunks: int
+    duplicate_sentences: int
+    truncated: bool
+    original_tokens: int
+    context_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.context_tokens
+
+
+class ContextBuilder:
+    """
+    Compact retrieved chunks into prompt context documents.
+
+    Chunks of the same page that are adjacent (consecutive chunk indices)
+    or whose texts overlap are merged into one document, keeping the
+    overlapping text once. Documents are ordered by their best rerank score;
+    sentences already present in a higher-ranked document are dropped, and
+    documents are added until `token_budget` is reached (the last one is
+    cut at a sentence or line boundary). Every document comes from a single
+    page, so "[Document N]" citations still map to exactly one page.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        min_sentence_chars: int = 20,
+        score_key: str = "rerank_score",
+    ):
+        self.token_budget = token_budget
+        self.min_sentence_chars = min_sentence_chars
+        self.score_key = score_key
+
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.original_tokens = 0
+        self.context_tokens = 0
+
+    def build(self, chunks: list[dict]) -> tuple[list[dict], ContextReport]:
+        """
+        Context documents for the given chunks (best first) and a report.
+
+        Documents are dicts with `page_number`, `original_text`,
+        `chunk_ids` and the score key, so they can be used wherever chunks
+        are for prompting and citation mapping.
+        """
+        documents = self._merge(chunks)
+        documents.sort(key=lambda doc: doc[self.score_key], reverse=True)
+        duplicates = self._drop_duplicate_sentences(documents)
+        documents, truncated = self._fit_budget(documents)
+
+        report = ContextReport(
+            chunks=len(chunks),
+            documents=len(documents),
+            merged_chunks=sum(len(doc["chunk_ids"]) - 1 for doc in documents),
+            duplicate_sentences=duplicates,
+            truncated=truncated,
+            original_tokens=sum(estimate_tokens(c["original_text"]) for c in chunks),
+            context_tokens=sum(estimate_tokens(d["original_text"]) for d in documents),
+        )
+        with self._lock:
+            self.queries += 1
+            self.original_tokens += report.original_tokens
+            self.context_tokens += report.context_tokens
+        return documents, report
+
+    def _merge(self, chunks: list[dict]) -> list[dict]:
+        """Merge adjacent/overlapping chunks of each page into documents."""
+        by_page: dict[int, list[tuple[int | None, int, dict]]] = {}
+        for rank, chunk in enumerate(chunks):
+            match = CHUNK_INDEX.search(chunk.get("chunk_id", ""))
+            index = int(match.group(1)) if match else None
+            by_page.setdefault(chunk["page_number"], []).append((index, rank, chunk))
+
+        documents = []
+        for page_number, page_chunks in by_page.items():
+            # Page order when indices are known, else retrieval order
+            page_chunks.sort(key=lambda item: (item[0] is None, item[0] or 0, item[1]))
+
+            current: dict | None = None
+            last_index: int | None = None
+            for index, _, chunk in page_chunks:
+                text = chunk["original_text"]
+                score = chunk.get(self.score_key, 0.0)
+
+                if current is not None:
+                    merged = self._join(
+                        current["original_text"],
+                        text,
+                        adjacent=(
+                            index is not None
+                            and last_index is not None
+                            and index == last_index + 1
+                        ),
+                    )
+                    if merged is not None:
+                        current["original_text"] = merged
+                        current["chunk_ids"].append(chunk["chunk_id"])
+                        current[self.score_key] = max(current[self.score_key], score)
+                        last_index = index
+                        continue
+                    documents.append(current)
+
+                current = {
+                    "page_number": page_number,
+                    "original_text": text,
+                    "chunk_ids": [chunk["chunk_id"]],
+                    self.score_key: score,
+                }
+                last_index = index
+
+            if current is not None:
+                documents.append(current)
+
+        return documents
+
+    @staticmethod
+    def _join(first: str, second: str, adjacent: bool) -> str | None:
+        """
+        `first` followed by `second` without their shared text, or None if
+        they are neither adjacent nor overlapping.
+        """
+        if second in first:
+            return first
+        if first in second:
+            return second
+
+        first_words = first.split()
+        second_spans = [m.span() for m in WORD.finditer(second)]
+        second_words = [second[start:end] for start, end in second_spans]
+
+        # Longest run of words ending `first` that also starts `second`
+        longest = min(len(first_words), len(second_words))
+        for size in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+            if first_words[-size] != second_words[0]:
+                continue
+            if first_words[-size:] == second_words[:size]:
+                return first + second[second_spans[size - 1][1] :]
+
+        if adjacent:
+            return first + "\n" + second
+        return None
+
+    def _drop_duplicate_sentences(self, documents: list[dict]) -> int:
+        """Remove sentences seen in a higher-ranked document; returns how many."""
+        seen: set[str] = set()
+        dropped = 0
+        for doc in documents:
+            lines = []
+            for line in doc["original_text"].split("\n"):
+                kept = []
+                for sentence in SENTENCE_BOUNDARY.split(line):
+                    key = " ".join(sentence.lower().split())
+                    if len(key) < self.min_sentence_chars:
+                        kept.append(sentence)
+                    elif key in seen:
+                        dropped += 1
+                    else:
+                        seen.add(key)
+                        kept.append(sentence)
+                if kept or not line.strip():
+                    lines.append(" ".join(kept))
+            doc["original_text"] = "\n".join(lines).strip()
+        return dropped
+
+    def _fit_budget(self, documents: list[dict]) -> tuple[list[dict], bool]:
+        """Keep documents in order until the token budget is spent."""
+        fitted = []
+        remaining = self.token_budget
+        for doc in documents:
+            if not doc["original_text"]:
+                continue
+            tokens = estimate_tokens(doc["original_text"])
+            if tokens <= remaining:
+                fitted.append(doc)
+                remaining -= tokens
+                continue
+
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = self._truncate(doc["original_text"], remaining * 4)
+                if estimate_tokens(text) >= MIN_TRUNCATED_TOKENS:
+                    doc["original_text"] = text
+                    fitted.append(doc)
+            return fitted, True
+        return fitted, False
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        """Cut text to at most `max_chars`, at the last sentence or line end."""
+        head = text[:max_chars]
+        boundaries = [m.start() for m in SENTENCE_BOUNDARY.finditer(head)]
+        cut = max([head.rfind("\n"), *boundaries])
+        return head[:cut].rstrip() if cut > 0 else head.rstrip()
+
+    def stats(self) -> dict:
+        """Token totals across all queries."""
+        with self._lock:
+            saved = self.original_tokens - self.context_tokens
+            return {
+                "queries": self.queries,
+                "token_budget": self.token_budget,
+                "original_tokens": self.original_tokens,
+                "context_tokens": self.context_tokens,
+                "tokens_saved": saved,
+                "saved_ratio": saved / self.original_tokens if self.original_tokens else 0.0,
+            }
@@ -0,0 +1,505 @@
+import asyncio
+import bisect
+import logging
+import math
+import random
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKENDS = ("gemini", "stub")
+
+# Upstream failures worth another attempt: rate limits, overload, timeouts
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,  # 429
+    google_exceptions.ServiceUnavailable,  # 503
+    google_exceptions.InternalServerError,  # 500
+    google_exceptions.DeadlineExceeded,  # 504
+    asyncio.TimeoutError,
+)
+
+TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, asyncio.TimeoutError)
+
+# Don't start an attempt with less time than this left in the budget
+MIN_ATTEMPT_SECONDS = 0.05
+
+
+class DeadlineExceededError(Exception):
+    """The request's time budget ran out before the LLM answered."""
+
+
+class LatencyHistogram:
+    """
+    Thread-safe latency histogram over fixed log-spaced buckets.
+
+    Bucket upper bounds grow by 10 per decade (~26% each) from `min_ms` to
+    `max_ms`, so quantiles are accurate to one bucket width without keeping
+    individual samples. Quantiles report the bucket's upper bound.
+    """
+
+    def __init__(
+        self, min_ms: float = 1.0, max_ms: float = 120_000.0, buckets_per_decade: int = 10
+    ):
+        n_bounds = math.ceil(math.log10(max_ms / min_ms) * buckets_per_decade) + 1
+        self.bounds_ms = [min_ms * 10 ** (i / buckets_per_decade) for i in range(n_bounds)]
+        self.counts = [0] * (n_bounds + 1)  # last bucket: above max_ms
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_observed_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Record one latency."""
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_observed_ms = max(self.max_observed_ms, ms)
+
+    def quantile(self, q: float) -> float | None:
+        """Latency (seconds) below which a fraction `q` of calls finished."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = q * self.count
+            cumulative = 0
+            for i, bucket_count in enumerate(self.counts):
+                cumulative += bucket_count
+                if cumulative >= target and bucket_count:
+                    if i == len(self.bounds_ms):
+                        return self.max_observed_ms / 1000
+                    return min(self.bounds_ms[i], self.max_observed_ms) / 1000
+            return self.max_observed_ms / 1000
+
+    def snapshot(self) -> dict:
+        """Count, mean, p50/p95/p99 and the non-empty buckets (upper bound ms → count)."""
+        quantiles = {
+            f"p{int(q * 100)}_ms": (value * 1000 if value is not None else None)
+            for q in (0.5, 0.95, 0.99)
+            for value in [self.quantile(q)]
+        }
+        with self._lock:
+            buckets = {
+                (f"{self.bounds_ms[i]:.0f}" if i < len(self.bounds_ms) else "inf"): count
+                for i, count in enumerate(self.counts)
+                if count
+            }
+            return {
+                "count": self.count,
+                "mean_ms": self.total_ms / self.count if self.count else None,
+                **quantiles,
+                "max_ms": self.max_observed_ms if self.count else None,
+                "buckets": buckets,
+            }
+
+
+class GeminiClient:
+    """
+    Gemini backend.
+
+    Async calls go through the SDK's grpc.aio transport: one long-lived
+    HTTP/2 channel, created on first use and shared by every call, so
+    concurrent requests are multiplexed over a pooled connection instead
+    of each opening its own. `timeout` is sent as the RPC deadline.
+    """
+
+    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _request_options(timeout: float | None) -> dict | None:
+        return {"timeout": timeout} if timeout else None
+
+    async def generate(self, prompt: str, timeout: float | None = None) -> str:
+        response = await self.model.generate_content_async(
+            prompt, request_options=self._request_options(timeout)
+        )
+        return response.text
+
+    async def stream(
+        self, prompt: str, timeout: float | None = None
+    ) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt, stream=True, request_options=self._request_options(timeout)
+        )
+        async for part in response:
+            try:
+                delta = part.text
+            except ValueError:
+                # Parts without text (e.g. a bare finish reason)
+                continue
+            yield delta
+
+    def generate_blocking(self, prompt: str, timeout: float | None = None) -> str:
+        response = self.model.generate_content(
+            prompt, request_options=self._request_options(timeout)
+        )
+        return response.text
+
+
+class StubLLMClient:
+    """
+    Offline stand-in for Gemini (tests, load tests, no API key).
+
+    Answers after a log-normal delay around `latency_ms` (`jitter` is its
+    sigma), fails with a 503 at `failure_rate`, and respects `timeout` like
+    the real API (DeadlineExceeded). The canned answer cites Document 1 so
+    citation handling is exercised end to end.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        jitter: float = 0.5,
+        failure_rate: float = 0.0,
+        answer: str = "This is a stub answer based on the provided manual sections [Document 1].",
+        seed: int | None = None,
+    ):
+        self.model_name = "stub"
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.answer = answer
+        self._random = random.Random(seed)
+
+    def _draw(self) -> float:
+        """Delay for one call (or an injected 503 at `failure_rate`)."""
+        delay = self.latency_ms / 1000 * self._random.lognormvariate(0.0, self.jitter)
+        if self._random.random() < self.failure_rate:
+            raise google_exceptions.ServiceUnavailable("stub: injected failure")
+        return delay
+
+    async def generate(self, prompt: str, timeout: float | None = None) -> str:
+        delay = self._draw()
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded("stub: deadline exceeded")
+        await asyncio.sleep(delay)
+        return self.answer
+
+    async def stream(
+        self, prompt: str, timeout: float | None = None
+    ) -> AsyncIterator[str]:
+        answer = await self.generate(prompt, timeout)
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+            await asyncio.sleep(0)
+
+    def generate_blocking(self, prompt: str, timeout: float | None = None) -> str:
+        delay = self._draw()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded("stub: deadline exceeded")
+        time.sleep(delay)
+        return self.answer
+
+
+class ResilientLLMClient:
+    """
+    Deadline-, concurrency- and retry-aware wrapper around an LLM backend.
+
+    At most `max_concurrency` upstream calls are in flight (hedges and
+    retries included). Each call's timeout is the time left until the
+    request's deadline, capped at `timeout_seconds`; rate-limit, overload
+    and timeout errors are retried with exponential backoff while attempts
+    and budget remain. With `hedge`, a second identical call is fired when
+    the first has not answered after the observed `hedge_quantile` latency
+    (once `hedge_min_samples` calls have been seen, and only if a slot is
+    free); the first answer wins and the other call is cancelled.
+    Per-call latencies are kept in histograms exposed by `stats`.
+    """
+
+    def __init__(
+        self,
+        backend: GeminiClient | StubLLMClient,
+        max_concurrency: int = 16,
+        timeout_seconds: float = 20.0,
+        max_retries: int = 2,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 50,
+    ):
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max(0, max_retries)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.latency = LatencyHistogram()
+        self.first_token_latency = LatencyHistogram()
+
+        self.calls = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    def _deadline(self, deadline: float | None) -> float:
+        """Absolute `time.monotonic()` deadline (default: room for every attempt)."""
+        if deadline is None:
+            return time.monotonic() + self.timeout_seconds * (self.max_retries + 1)
+        return deadline
+
+    def _timeout(self, deadline: float) -> float:
+        """Timeout for the next call, or raise if the budget is spent."""
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            raise DeadlineExceededError("LLM request budget exhausted")
+        return min(self.timeout_seconds, remaining)
+
+    @staticmethod
+    def _raise_if_out_of_budget(deadline: float, error: BaseException) -> None:
+        """Report a timeout that used up the whole budget as DeadlineExceededError."""
+        if deadline - time.monotonic() < MIN_ATTEMPT_SECONDS:
+            raise DeadlineExceededError(
+                "LLM did not answer within the request budget"
+            ) from error
+
+    def _retry_policy(self, deadline: float) -> dict:
+        """Tenacity arguments shared by the async and blocking paths."""
+
+        def out_of_budget(retry_state) -> bool:
+            return deadline - time.monotonic() < MIN_ATTEMPT_SECONDS
+
+        def log_retry(retry_state) -> None:
+            self.retries += 1
+            logger.warning(
+                f"LLM call failed ({retry_state.outcome.exception()!r}); retrying in "
+                f"{retry_state.next_action.sleep:.1f}s "
+                f"(attempt {retry_state.attempt_number})"
+            )
+
+        return dict(
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
+            stop=stop_after_attempt(self.max_retries + 1) | out_of_budget,
+            before_sleep=log_retry,
+            reraise=True,
+        )
+
+    async def generate(self, prompt: str, deadline: float | None = None) -> str:
+        """Answer text for a prompt, within the deadline (`time.monotonic()`)."""
+        deadline = self._deadline(deadline)
+        try:
+            async for attempt in AsyncRetrying(**self._retry_policy(deadline)):
+                with attempt:
+                    return await self._hedged_call(prompt, deadline)
+        except TIMEOUT_ERRORS as e:
+            self._raise_if_out_of_budget(deadline, e)
+            raise
+        raise AssertionError("unreachable: tenacity reraises the last error")
+
+    def generate_blocking(self, prompt: str, deadline: float | None = None) -> str:
+        """Blocking `generate` for scripts (same timeouts and retries, no hedging)."""
+        deadline = self._deadline(deadline)
+        try:
+            return self._generate_blocking(prompt, deadline)
+        except TIMEOUT_ERRORS as e:
+            self._raise_if_out_of_budget(deadline, e)
+            raise
+
+    def _generate_blocking(self, prompt: str, deadline: float) -> str:
+        for attempt in Retrying(**self._retry_policy(deadline)):
+            with attempt:
+                timeout = self._timeout(deadline)
+                self.calls += 1
+                start = time.monotonic()
+                try:
+                    text = self.backend.generate_blocking(prompt, timeout=timeout)
+                except google_exceptions.DeadlineExceeded:
+                    self.timeouts += 1
+                    raise
+                except Exception:
+                    self.errors += 1
+                    raise
+                self.latency.observe(time.monotonic() - start)
+                return text
+        raise AssertionError("unreachable: tenacity reraises the last error")
+
+    async def _acquire_slot(self, deadline: float) -> None:
+        """Wait for a concurrency slot, but not past the deadline."""
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            raise DeadlineExceededError("LLM request budget exhausted")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), remaining)
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceededError(
+                "No LLM slot became free within the request budget"
+            ) from e
+
+    async def _call(self, prompt: str, deadline: float) -> str:
+        """One upstream call holding a concurrency slot."""
+        await self._acquire_slot(deadline)
+        try:
+            timeout = self._timeout(deadline)
+            self.calls += 1
+            self.in_flight += 1
+            start = time.monotonic()
+            try:
+                text = await asyncio.wait_for(
+                    self.backend.generate(prompt, timeout=timeout), timeout
+                )
+            except TIMEOUT_ERRORS:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+            self.latency.observe(time.monotonic() - start)
+            return text
+        finally:
+            self._slots.release()
+
+    def _hedge_delay(self) -> float | None:
+        if not self.hedge or self.latency.count < self.hedge_min_samples:
+            return None
+        return self.latency.quantile(self.hedge_quantile)
+
+    async def _hedged_call(self, prompt: str, deadline: float) -> str:
+        """Call once; if slower than the hedge delay, race a second call."""
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._call(prompt, deadline)
+
+        primary = asyncio.ensure_future(self._call(prompt, deadline))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            # Only hedge with spare capacity, so hedging never queues behind itself
+            if not done and not self._slots.locked():
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._call(prompt, deadline)))
+
+            error: BaseException | None = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    assert error is not None
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(
+        self, prompt: str, deadline: float | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream answer text under the same slot limit and deadline. Not
+        hedged; failures are retried only before the first text is emitted.
+        """
+        deadline = self._deadline(deadline)
+        for attempt in range(self.max_retries + 1):
+            emitted = False
+            try:
+                await self._acquire_slot(deadline)
+                try:
+                    parts = self.backend.stream(prompt, timeout=self._timeout(deadline))
+                    self.calls += 1
+                    self.in_flight += 1
+                    start = time.monotonic()
+                    try:
+                        while True:
+                            try:
+                                delta = await asyncio.wait_for(
+                                    anext(parts), self._timeout(deadline)
+                                )
+                            except StopAsyncIteration:
+                                break
+                            if not emitted:
+                                self.first_token_latency.observe(time.monotonic() - start)
+                                emitted = True
+                            yield delta
+                    finally:
+                        self.in_flight -= 1
+                        await parts.aclose()
+                finally:
+                    self._slots.release()
+                return
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, TIMEOUT_ERRORS):
+                    self.timeouts += 1
+                    self._raise_if_out_of_budget(deadline, e)
+                else:
+                    self.errors += 1
+                if emitted or attempt == self.max_retries:
+                    raise
+                backoff = min(4.0, 0.5 * 2**attempt)
+                if deadline - time.monotonic() < backoff + MIN_ATTEMPT_SECONDS:
+                    raise
+                self.retries += 1
+                logger.warning(f"LLM stream failed ({e!r}); retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> dict:
+        """Call counters and latency histograms."""
+        return {
+            "model": self.model_name,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency": self.latency.snapshot(),
+            "first_token_latency": self.first_token_latency.snapshot(),
+        }
+
+
+def create_llm_client(
+    backend: str,
+    api_key: str | None = None,
+    model_name: str = "gemini-2.5-flash",
+    stub_latency_ms: float = 200.0,
+    **resilience,
+) -> ResilientLLMClient:
+    """Build the configured backend wrapped with deadlines, retries and hedging."""
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}', expected {LLM_BACKENDS}")
+
+    if backend == "stub":
+        client: GeminiClient | StubLLMClient = StubLLMClient(latency_ms=stub_latency_ms)
+    else:
+        if not api_key:
+            raise ValueError("The gemini LLM backend needs an API key")
+        client = GeminiClient(api_key, model_name)
+
+    logger.info(f"LLM client ready (backend={backend}, model={client.model_name})")
+    return ResilientLLMClient(client, **resilience)
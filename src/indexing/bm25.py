@@ -0,0 +1,167 @@
+import logging
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text: str) -> list[str]:
+    """Simple whitespace tokenization (BM25 standard)."""
+    return text.lower().split()
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a precomputed sparse term-document weight matrix.
+
+    Produces the same scores as `rank_bm25.BM25Okapi` (same IDF, including the
+    epsilon floor for negative IDFs, and the same k1/b length normalization),
+    but every (term, doc) weight is computed once at build time. A query is
+    then a sparse matrix-vector product plus `np.argpartition` for top-k (a
+    batch of queries, a sparse matrix-matrix product).
+    Weights are stored as float32, so scores agree to ~1e-6 relative.
+    """
+
+    def __init__(
+        self,
+        vocabulary: dict[str, int],
+        weights: sparse.csr_matrix,
+        doc_lengths: np.ndarray,
+    ):
+        """
+        Initialize from prebuilt parts (use `build` to index a corpus).
+        """
+        self.vocabulary = vocabulary
+        self.weights = weights  # shape (n_terms, n_docs), CSR by term
+        self.doc_lengths = doc_lengths
+
+    @property
+    def num_docs(self) -> int:
+        return int(self.weights.shape[1])
+
+    @classmethod
+    def build(
+        cls,
+        tokenized_corpus: list[list[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        """
+        Build the index (defaults match BM25Okapi).
+        """
+        vocabulary: dict[str, int] = {}
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        term_freqs: list[int] = []
+
+        for doc_id, tokens in enumerate(tokenized_corpus):
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        n_docs = len(tokenized_corpus)
+        n_terms = len(vocabulary)
+        rows = np.asarray(term_ids, dtype=np.int64)
+        cols = np.asarray(doc_ids, dtype=np.int64)
+        tf = np.asarray(term_freqs, dtype=np.float64)
+
+        doc_lengths = np.asarray([len(t) for t in tokenized_corpus], dtype=np.int32)
+        avgdl = doc_lengths.sum() / n_docs if n_docs else 0.0
+
+        # IDF with BM25Okapi's epsilon floor for very common terms
+        doc_freq = np.bincount(rows, minlength=n_terms).astype(np.float64)
+        idf = np.log(n_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        average_idf = idf.mean() if n_terms else 0.0
+        idf[idf < 0] = epsilon * average_idf
+
+        norm = k1 * (1 - b + b * doc_lengths[cols] / avgdl) if avgdl else k1
+        values = idf[rows] * tf * (k1 + 1) / (tf + norm)
+
+        weights = sparse.csr_matrix(
+            (values.astype(np.float32), (rows, cols)), shape=(n_terms, n_docs)
+        )
+        logger.info(
+            f"✓ BM25 index built ({n_docs} docs, {n_terms} terms, "
+            f"{weights.nnz} postings)"
+        )
+        return cls(vocabulary, weights, doc_lengths)
+
+    def _query_terms(self, tokens: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Map query tokens to (term ids, counts); unknown tokens score 0."""
+        counts = Counter(self.vocabulary[t] for t in tokens if t in self.vocabulary)
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        freqs = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return ids, freqs
+
+    def get_scores(self, tokens: list[str]) -> np.ndarray:
+        """
+        BM25 score of every document for a tokenized query.
+        """
+        ids, freqs = self._query_terms(tokens)
+        if len(ids) == 0:
+            return np.zeros(self.num_docs, dtype=np.float32)
+        return np.asarray(self.weights[ids].T @ freqs, dtype=np.float32)
+
+    def top_k(self, tokens: list[str], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Highest-scoring document rows and their scores (descending).
+        """
+        scores = self.get_scores(tokens)
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order, scores[order]
+
+    def top_k_batch(
+        self, token_lists: list[list[str]], k: int, block_size: int = 256
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        `top_k` for many queries at once.
+
+        Queries become one sparse (n_queries × n_terms) count matrix, scored
+        against the weights with a single sparse matrix-matrix product per
+        block of `block_size` queries (bounding the dense score block), then
+        a row-wise `np.argpartition`.
+        """
+        k = min(k, self.num_docs)
+        if k <= 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(token_lists)
+
+        output: list[tuple[np.ndarray, np.ndarray]] = []
+        for start in range(0, len(token_lists), block_size):
+            block = token_lists[start : start + block_size]
+            terms = [self._query_terms(tokens) for tokens in block]
+            indptr = np.cumsum([0] + [len(ids) for ids, _ in terms])
+            query_matrix = sparse.csr_matrix(
+                (
+                    np.concatenate([freqs for _, freqs in terms]),
+                    np.concatenate([ids for ids, _ in terms]),
+                    indptr,
+                ),
+                shape=(len(block), self.weights.shape[0]),
+            )
+            scores = np.asarray(
+                (query_matrix @ self.weights).toarray(), dtype=np.float32
+            )
+
+            if k < self.num_docs:
+                candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(self.num_docs), scores.shape)
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind="stable")
+            rows = np.take_along_axis(candidates, order, axis=1)
+            top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            output.extend(zip(rows, top_scores))
+        return output
@@ -1,8 +1,12 @@
 import logging
+import time
+from pathlib import Path
 
 import numpy as np
 from FlagEmbedding import BGEM3FlagModel
 
+from src.batching import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -11,42 +15,152 @@ class Embedder:
     Generate embeddings using BGE-M3 model.
     """
 
-    def __init__(self, model_name: str = "BAAI/bge-m3", use_fp16: bool = False):
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-m3",
+        use_fp16: bool = False,
+        query_max_length: int = 512,
+        query_batch_window_ms: float = 5.0,
+        query_max_batch_size: int = 16,
+    ):
         """
         Initialize BGE-M3 embedding model.
         """
         logger.info(f"Loading embedding model: {model_name}")
         self.model = BGEM3FlagModel(model_name, use_fp16=use_fp16)
         self.dimension = 1024
+        self.query_max_length = query_max_length
+        self.last_embed_stats: dict = {}
+
+        # Concurrent embed_query calls are coalesced into one encode
+        self.query_batcher: MicroBatcher[str, np.ndarray] = MicroBatcher(
+            self._encode_queries,
+            max_batch_size=query_max_batch_size,
+            max_wait_ms=query_batch_window_ms,
+            name="query-embedder",
+        )
         logger.info(f"Model loaded (dimension={self.dimension})")
 
-    def embed_documents(self, texts: list[str], batch_size: int = 12) -> np.ndarray:
+    def embed_documents(
+        self,
+        texts: list[str],
+        token_budget: int = 16384,
+        max_length: int = 1024,
+        output_path: str | Path | None = None,
+    ) -> np.ndarray:
         """
         Embed document texts (for indexing).
+
+        Texts are sorted by token length and packed into batches whose
+        padded size (rows × longest row) stays within `token_budget`, so
+        short chunks run in large batches and long ones in small batches
+        without padding waste. Results are written back in input order; with
+        `output_path` they stream into a .npy memmap as batches finish.
         """
-        logger.info(f"Embedding {len(texts)} documents (batch_size={batch_size})")
+        n = len(texts)
+        start = time.perf_counter()
 
-        output = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            max_length=8192,  # BGE-M3 supports up to 8192 tokens
+        # Batched tokenization to measure lengths (incl. special tokens)
+        lengths = np.array(
+            [
+                len(ids)
+                for ids in self.model.tokenizer(
+                    texts, truncation=True, max_length=max_length
+                )["input_ids"]
+            ],
+            dtype=np.int64,
         )
+        order = np.argsort(-lengths, kind="stable")  # longest first
+        batches = self._length_buckets(lengths[order], token_budget)
 
-        dense_embeddings: np.ndarray = np.array(output['dense_vecs'])
-        dense_embeddings = dense_embeddings / np.linalg.norm(
-            dense_embeddings, axis=1, keepdims=True
+        logger.info(
+            f"Embedding {n} documents in {len(batches)} length-bucketed batches "
+            f"(token_budget={token_budget}, max_length={max_length})"
         )
 
-        logger.info(f"✓ Generated embeddings: shape={dense_embeddings.shape}")
-        return dense_embeddings
+        if output_path is not None:
+            embeddings = np.lib.format.open_memmap(
+                str(output_path), mode="w+", dtype=np.float32, shape=(n, self.dimension)
+            )
+        else:
+            embeddings = np.empty((n, self.dimension), dtype=np.float32)
+
+        for batch_start, batch_end in batches:
+            rows = order[batch_start:batch_end]
+            output = self.model.encode(
+                [texts[i] for i in rows],
+                batch_size=len(rows),
+                max_length=max_length,
+            )
+            dense = np.atleast_2d(np.array(output["dense_vecs"], dtype=np.float32))
+            embeddings[rows] = dense / np.linalg.norm(dense, axis=1, keepdims=True)
+
+        if isinstance(embeddings, np.memmap):
+            embeddings.flush()
+
+        elapsed = time.perf_counter() - start
+        total_tokens = int(lengths.sum())
+        self.last_embed_stats = {
+            "documents": n,
+            "batches": len(batches),
+            "tokens": total_tokens,
+            "padded_tokens": int(
+                sum((e - s) * lengths[order[s]] for s, e in batches)
+            ),
+            "seconds": elapsed,
+            "tokens_per_second": total_tokens / elapsed if elapsed else 0.0,
+        }
+        logger.info(
+            f"✓ Generated embeddings: shape={embeddings.shape} in {elapsed:.1f}s "
+            f"({self.last_embed_stats['tokens_per_second']:.0f} tokens/s, "
+            f"{self.last_embed_stats['padded_tokens']} padded tokens)"
+        )
+        return embeddings
+
+    @staticmethod
+    def _length_buckets(
+        sorted_lengths: np.ndarray, token_budget: int
+    ) -> list[tuple[int, int]]:
+        """Split descending lengths into [start, end) batches within the budget."""
+        batches = []
+        start = 0
+        while start < len(sorted_lengths):
+            # First row is the longest, so it sets the padded width
+            width = max(1, int(sorted_lengths[start]))
+            size = max(1, token_budget // width)
+            end = min(start + size, len(sorted_lengths))
+            batches.append((start, end))
+            start = end
+        return batches
 
     def embed_query(self, query: str) -> np.ndarray:
         """
         Embed a single query (for retrieval).
         """
-        output = self.model.encode([query], batch_size=1, max_length=8192)
+        return self.query_batcher.submit(query)
+
+    def embed_queries(self, queries: list[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Embed many queries in one encode call (rows follow input order).
+
+        Bypasses the micro-batcher, which would split the list into
+        `query_max_batch_size` pieces; the model still runs forward passes
+        of at most `batch_size` queries.
+        """
+        if not queries:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack(self._encode_queries(queries, batch_size=batch_size))
+
+    def _encode_queries(
+        self, queries: list[str], batch_size: int | None = None
+    ) -> list[np.ndarray]:
+        """Run one batched encode and return a normalized vector per query."""
+        output = self.model.encode(
+            queries,
+            batch_size=min(batch_size or len(queries), len(queries)),
+            max_length=self.query_max_length,
+        )
 
-        # Extract dense embedding
-        embedding: np.ndarray = np.array(output['dense_vecs'][0])
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding
+        embeddings = np.atleast_2d(np.array(output["dense_vecs"]))
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return list(embeddings)
@@ -1,17 +1,41 @@
+import hashlib
 import logging
-import pickle
+from collections.abc import Iterable
 from pathlib import Path
 
 import chromadb
 import numpy as np
 from chromadb.config import Settings
-from rank_bm25 import BM25Okapi
+from chromadb.errors import NotFoundError
 
+from src.indexing.bm25 import BM25Index, tokenize
 from src.indexing.embedder import Embedder
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_store import MatrixVectorStore, export_chroma_embeddings
 from src.ingestion.chunker import Chunk
 
 logger = logging.getLogger(__name__)
 
+# Full rebuilds go into "<name>__staging" and are swapped in when complete;
+# the replaced collection is kept as "<name>__previous" until the next one
+STAGING_SUFFIX = "__staging"
+PREVIOUS_SUFFIX = "__previous"
+
+
+def chunk_content_hash(chunk: Chunk, embedding_model: str, max_length: int) -> str:
+    """Hash of everything that determines a chunk's index entry."""
+    digest = hashlib.sha256()
+    for part in (
+        embedding_model,
+        str(max_length),
+        str(chunk.page_number),
+        chunk.text,
+        chunk.contextualized_text,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 
 class IndexBuilder:
     """
@@ -23,57 +47,302 @@ class IndexBuilder:
         persist_dir: str,
         embedding_model: str,
         collection_name: str = "boeing_737",
+        vector_dtype: str = "float32",
+        ivf_nlist: int = 0,
+        vector_backend: str = "chroma",
+        doc_max_length: int = 1024,
+        token_budget: int = 16384,
+        embedder: Embedder | None = None,
     ):
         """
-        Initialize index builder.
+        Initialize index builder (pass `embedder` to reuse a loaded model).
+
+        The row-aligned dense matrix under dense/ is only written when
+        `vector_backend` is "matrix"; the Chroma backend searches the
+        collection directly.
         """
         self.persist_dir = Path(persist_dir)
         self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.vector_dtype = vector_dtype
+        self.ivf_nlist = ivf_nlist
+        self.vector_backend = vector_backend
+        self.doc_max_length = doc_max_length
+        self.token_budget = token_budget
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
 
-        self.embedder = Embedder(embedding_model, use_fp16=False)
+        self.embedder = embedder or Embedder(embedding_model, use_fp16=False)
 
         # Initialize ChromaDB with persistent storage
         logger.info(f"Initializing ChromaDB at {self.persist_dir}")
         self.client = chromadb.PersistentClient(
             path=str(self.persist_dir),
-            settings=Settings(anonymized_telemetry=False, allow_reset=True),
+            settings=Settings(anonymized_telemetry=False),
         )
 
         # Create or get collection with cosine similarity
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
+        self.collection = self._get_collection()
+
+        logger.info(f"Collection '{collection_name}' ready")
+
+    def _get_collection(self, name: str | None = None):
+        """Create or get the collection (cosine space for normalized embeddings)."""
+        return self.client.get_or_create_collection(
+            name=name or self.collection_name,
             metadata={"hnsw:space": "cosine"},  # Match normalized embeddings
         )
 
-        logger.info(f"Collection '{collection_name}' ready")
+    def _drop_collection(self, name: str) -> None:
+        """Delete a collection if it exists."""
+        try:
+            self.client.delete_collection(name)
+        except NotFoundError:
+            pass
 
-    def build_indices(self, chunks: list[Chunk]) -> None:
+    def _start_full_rebuild(self) -> None:
+        """Build into an empty staging collection while the live one keeps serving."""
+        staging = self.collection_name + STAGING_SUFFIX
+        self._drop_collection(staging)  # left over from an interrupted rebuild
+        logger.info(f"Full rebuild into staging collection '{staging}'")
+        self.collection = self._get_collection(staging)
+
+    def _swap_in_staging(self) -> None:
+        """
+        Publish the staging collection under the live name.
+
+        The replaced collection is renamed aside rather than deleted, so a
+        running API that still holds it keeps answering until restarted.
+        """
+        previous = self.collection_name + PREVIOUS_SUFFIX
+        self._drop_collection(previous)
+        try:
+            self.client.get_collection(self.collection_name).modify(name=previous)
+        except NotFoundError:
+            pass
+        self.collection.modify(name=self.collection_name)
+        logger.info(f"Swapped rebuilt collection in as '{self.collection_name}'")
+
+    def build_indices(self, chunks: list[Chunk], incremental: bool = True) -> dict:
         """
         Build both vector (ChromaDB) and BM25 indices from chunks.
+
+        In incremental mode only new or changed chunks (by content hash stored
+        in Chroma metadata) are embedded and upserted, and chunks no longer
+        present are deleted. Otherwise everything is embedded into a staging
+        collection that replaces the live one once the build is complete.
+        Returns counts of added/updated/deleted/unchanged chunks.
         """
         if not chunks:
             raise ValueError("No chunks provided for indexing")
 
-        logger.info(f"Building indices for {len(chunks)} chunks")
+        logger.info(
+            f"Building indices for {len(chunks)} chunks (incremental={incremental})"
+        )
 
         # Prepare data
         chunk_ids = [c.chunk_id for c in chunks]
+        if len(set(chunk_ids)) != len(chunk_ids):
+            raise ValueError("Duplicate chunk ids in input")
         # Use contextualized text for richer semantic matching
         texts = [c.contextualized_text for c in chunks]
+        hashes = [
+            chunk_content_hash(c, self.embedding_model, self.doc_max_length)
+            for c in chunks
+        ]
+
+        if not incremental:
+            self._start_full_rebuild()
+
+        # Diff against what is already indexed
+        indexed = self._indexed_hashes()
+        changed = [
+            i for i, (cid, h) in enumerate(zip(chunk_ids, hashes)) if indexed.get(cid) != h
+        ]
+        deleted = sorted(set(indexed) - set(chunk_ids))
+        stats = {
+            "added": sum(1 for i in changed if chunk_ids[i] not in indexed),
+            "updated": sum(1 for i in changed if chunk_ids[i] in indexed),
+            "deleted": len(deleted),
+            "unchanged": len(chunks) - len(changed),
+        }
+        logger.info(f"Index diff: {stats}")
+
+        # Generate embeddings only for new/changed chunks
+        if changed:
+            logger.info(f"Generating embeddings for {len(changed)} chunks...")
+            # Stream batches into a memmap instead of holding them in RAM
+            partial_path = self.persist_dir / "embeddings.partial.npy"
+            changed_embeddings = self.embedder.embed_documents(
+                [texts[i] for i in changed],
+                token_budget=self.token_budget,
+                max_length=self.doc_max_length,
+                output_path=partial_path,
+            )
+
+            # Upsert into vector index (ChromaDB) straight from the memmap
+            logger.info("Upserting to ChromaDB...")
+            self._add_to_chromadb(
+                [chunk_ids[i] for i in changed],
+                [texts[i] for i in changed],
+                changed_embeddings,
+                [chunks[i] for i in changed],
+                [hashes[i] for i in changed],
+            )
+            del changed_embeddings
+            partial_path.unlink(missing_ok=True)
+
+        if deleted:
+            logger.info(f"Deleting {len(deleted)} stale chunks from ChromaDB...")
+            for i in range(0, len(deleted), 1000):
+                self.collection.delete(ids=deleted[i : i + 1000])
+
+        self._write_row_indices(
+            chunk_ids,
+            texts,
+            [c.text for c in chunks],
+            [c.page_number for c in chunks],
+        )
+        if not incremental:
+            self._swap_in_staging()
+
+        logger.info("✓ Indices built successfully")
+        stats["embedding"] = self.embedder.last_embed_stats if changed else {}
+        return stats
+
+    def build_indices_streaming(
+        self,
+        chunks: Iterable[Chunk],
+        incremental: bool = True,
+        batch_size: int = 256,
+    ) -> dict:
+        """
+        Build indices from a stream of chunks (e.g. straight from ingestion).
+
+        New or changed chunks are embedded and upserted every `batch_size`
+        chunks while upstream stages keep producing. Only the lexical fields
+        are kept for the final BM25 pass, which needs corpus-wide
+        statistics; with the matrix backend, dense vectors are read back from
+        Chroma for the matrix index. Returns the same stats as `build_indices`.
+        """
+        if not incremental:
+            self._start_full_rebuild()
+
+        indexed = self._indexed_hashes()
+        chunk_ids: list[str] = []
+        texts: list[str] = []
+        original_texts: list[str] = []
+        page_numbers: list[int] = []
+        seen: set[str] = set()
+
+        stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        embed_stats: dict = {}
+        pending: list[tuple[Chunk, str]] = []
 
-        # Generate embeddings
-        logger.info("Generating embeddings...")
-        embeddings = self.embedder.embed_documents(texts)
+        for chunk in chunks:
+            if chunk.chunk_id in seen:
+                raise ValueError(f"Duplicate chunk id in input: {chunk.chunk_id}")
+            seen.add(chunk.chunk_id)
 
-        # Build vector index (ChromaDB)
-        logger.info("Adding to ChromaDB...")
-        self._add_to_chromadb(chunk_ids, texts, embeddings, chunks)
+            chunk_ids.append(chunk.chunk_id)
+            texts.append(chunk.contextualized_text)
+            original_texts.append(chunk.text)
+            page_numbers.append(chunk.page_number)
 
+            content_hash = chunk_content_hash(
+                chunk, self.embedding_model, self.doc_max_length
+            )
+            if indexed.get(chunk.chunk_id) == content_hash:
+                stats["unchanged"] += 1
+                continue
+
+            stats["updated" if chunk.chunk_id in indexed else "added"] += 1
+            pending.append((chunk, content_hash))
+            if len(pending) >= batch_size:
+                self._merge_embed_stats(embed_stats, self._embed_and_upsert(pending))
+                pending = []
+
+        if pending:
+            self._merge_embed_stats(embed_stats, self._embed_and_upsert(pending))
+
+        if not chunk_ids:
+            raise ValueError("No chunks provided for indexing")
+
+        deleted = sorted(set(indexed) - seen)
+        stats["deleted"] = len(deleted)
+        if deleted:
+            logger.info(f"Deleting {len(deleted)} stale chunks from ChromaDB...")
+            for i in range(0, len(deleted), 1000):
+                self.collection.delete(ids=deleted[i : i + 1000])
+        logger.info(f"Index diff: {stats}")
+
+        self._write_row_indices(chunk_ids, texts, original_texts, page_numbers)
+        if not incremental:
+            self._swap_in_staging()
+
+        logger.info("✓ Indices built successfully")
+        stats["embedding"] = embed_stats
+        return stats
+
+    def _embed_and_upsert(self, batch: list[tuple[Chunk, str]]) -> dict:
+        """Embed one batch of (chunk, content hash), upsert it; return embed stats."""
+        chunks = [chunk for chunk, _ in batch]
+        texts = [c.contextualized_text for c in chunks]
+        embeddings = self.embedder.embed_documents(
+            texts, token_budget=self.token_budget, max_length=self.doc_max_length
+        )
+        self._add_to_chromadb(
+            [c.chunk_id for c in chunks],
+            texts,
+            embeddings,
+            chunks,
+            [content_hash for _, content_hash in batch],
+        )
+        return self.embedder.last_embed_stats
+
+    @staticmethod
+    def _merge_embed_stats(total: dict, batch: dict) -> None:
+        """Accumulate per-batch embedding stats in place."""
+        for key in ("documents", "batches", "tokens", "padded_tokens", "seconds"):
+            total[key] = total.get(key, 0) + batch[key]
+        total["tokens_per_second"] = (
+            total["tokens"] / total["seconds"] if total["seconds"] else 0.0
+        )
+
+    def _write_row_indices(
+        self,
+        chunk_ids: list[str],
+        texts: list[str],
+        original_texts: list[str],
+        page_numbers: list[int],
+    ) -> None:
+        """Write the lexical index and, for the matrix backend, the dense matrix."""
         # Build BM25 index
         logger.info("Building BM25 index...")
-        self._build_bm25_index(chunk_ids, texts, chunks)
+        lexical_header = self._build_bm25_index(
+            chunk_ids, texts, original_texts, page_numbers
+        )
 
-        logger.info("✓ Indices built successfully")
+        if self.vector_backend != "matrix":
+            return
+
+        # Build in-process dense index, read back from Chroma in lexical row order
+        logger.info("Writing dense matrix index...")
+        embeddings = export_chroma_embeddings(self.collection, chunk_ids)
+        MatrixVectorStore.write(
+            self.persist_dir / "dense",
+            embeddings,
+            dtype=self.vector_dtype,
+            ivf_nlist=self.ivf_nlist,
+            lexical_version=lexical_header["checksum"],
+        )
+
+    def _indexed_hashes(self) -> dict[str, str]:
+        """Content hash of every chunk currently in the collection."""
+        result = self.collection.get(include=["metadatas"])
+        return {
+            chunk_id: (metadata or {}).get("content_hash", "")
+            for chunk_id, metadata in zip(result["ids"], result["metadatas"])
+        }
 
     def _add_to_chromadb(
         self,
@@ -81,8 +350,9 @@ class IndexBuilder:
         texts: list[str],
         embeddings: np.ndarray,
         chunks: list[Chunk],
+        content_hashes: list[str],
     ) -> None:
-        """Add embeddings and metadata to ChromaDB in batches."""
+        """Upsert embeddings and metadata to ChromaDB in batches."""
 
         # ChromaDB performs better with batch insertions
         batch_size = 100
@@ -90,7 +360,7 @@ class IndexBuilder:
         for i in range(0, len(chunks), batch_size):
             batch_end = min(i + batch_size, len(chunks))
 
-            self.collection.add(
+            self.collection.upsert(
                 ids=chunk_ids[i:batch_end],
                 embeddings=embeddings[i:batch_end].tolist(),
                 documents=texts[i:batch_end],
@@ -99,8 +369,9 @@ class IndexBuilder:
                         "page_number": c.page_number,
                         "chunk_id": c.chunk_id,
                         "original_text": c.text,  # Store non-contextualized for display
+                        "content_hash": h,
                     }
-                    for c in chunks[i:batch_end]
+                    for c, h in zip(chunks[i:batch_end], content_hashes[i:batch_end])
                 ],
             )
 
@@ -110,30 +381,30 @@ class IndexBuilder:
                 )
 
     def _build_bm25_index(
-        self, chunk_ids: list[str], texts: list[str], chunks: list[Chunk]
-    ) -> None:
-        """Build and persist BM25 index."""
-
-        # Simple whitespace tokenization (BM25 standard)
-        tokenized_texts = [text.lower().split() for text in texts]
-        bm25 = BM25Okapi(tokenized_texts)
-
-        # Save BM25 index and metadata
-        bm25_path = self.persist_dir / "bm25_index.pkl"
-
-        with open(bm25_path, "wb") as f:
-            pickle.dump(
-                {
-                    "bm25": bm25,
-                    "chunk_ids": chunk_ids,
-                    "texts": texts,
-                    "page_numbers": [c.page_number for c in chunks],
-                    "original_texts": [c.text for c in chunks],
-                },
-                f,
-            )
+        self,
+        chunk_ids: list[str],
+        texts: list[str],
+        original_texts: list[str],
+        page_numbers: list[int],
+    ) -> dict:
+        """Build and persist BM25 index; returns the index header."""
+
+        # Sparse term-document weight matrix with precomputed IDF/length norms
+        bm25 = BM25Index.build([tokenize(text) for text in texts])
+
+        # Save BM25 postings and row metadata in the memory-mappable format
+        lexical_dir = self.persist_dir / "lexical"
+        header = LexicalIndex.write(
+            lexical_dir,
+            bm25=bm25,
+            chunk_ids=chunk_ids,
+            texts=texts,
+            original_texts=original_texts,
+            page_numbers=page_numbers,
+        )
 
-        logger.info(f"✓ BM25 index saved to {bm25_path}")
+        logger.info(f"✓ BM25 index saved to {lexical_dir}")
+        return header
 
     def get_collection_stats(self) -> dict:
         """Get statistics about the indexed collection."""
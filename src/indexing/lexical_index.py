@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import mmap
+import shutil
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from src.indexing.bm25 import BM25Index
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "boeing-737-rag/lexical-index"
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+
+
+class StaleIndexError(ValueError):
+    """On-disk index is missing, from another format version, or corrupted."""
+
+
+class TextStore:
+    """
+    Read-only array of strings: int64 offsets + one UTF-8 blob.
+
+    Both files are memory-mapped, so workers share pages through the OS
+    cache and only the strings actually accessed are decoded.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: mmap.mmap | bytes):
+        self.offsets = offsets
+        self.blob = blob
+
+    @staticmethod
+    def write(prefix: Path, texts: list[str]) -> list[Path]:
+        """Write `<prefix>.offsets.npy` and `<prefix>.bin`; return the paths."""
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+
+        offsets_path = prefix.with_name(prefix.name + ".offsets.npy")
+        blob_path = prefix.with_name(prefix.name + ".bin")
+        np.save(offsets_path, offsets)
+        with open(blob_path, "wb") as f:
+            for e in encoded:
+                f.write(e)
+        return [offsets_path, blob_path]
+
+    @classmethod
+    def open(cls, prefix: Path) -> "TextStore":
+        """Memory-map a store written by `write`."""
+        offsets = np.load(prefix.with_name(prefix.name + ".offsets.npy"), mmap_mode="r")
+        blob_path = prefix.with_name(prefix.name + ".bin")
+
+        blob: mmap.mmap | bytes = b""
+        if blob_path.stat().st_size > 0:
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.blob[start:end].decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+def replace_directory(tmp_dir: Path, directory: Path) -> None:
+    """
+    Swap a fully written `tmp_dir` in as `directory`.
+
+    The current directory is renamed to "<dir>.old" (not deleted) before
+    the new one is renamed into place, so a failure in between leaves the
+    previous index on disk; the old copy is removed once the swap is done.
+    """
+    old_dir = directory.with_name(directory.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if directory.exists():
+        directory.rename(old_dir)
+    tmp_dir.rename(directory)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+
+
+def _sha256(path: Path) -> str:
+    """Hex digest of a file, streamed in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LexicalIndex:
+    """
+    Versioned on-disk BM25 index plus row-addressed chunk metadata.
+
+    Layout of the index directory:
+        header.json             format/version, counts, per-file sha256
+        vocab.json              terms in term-id order
+        bm25_{indptr,indices,weights}.npy   CSR term-document weights
+        doc_lengths.npy, page_numbers.npy   per-row int32 arrays
+        {chunk_ids,texts,original_texts}.{offsets.npy,bin}   text stores
+    """
+
+    def __init__(
+        self,
+        bm25: BM25Index,
+        chunk_ids: TextStore,
+        texts: TextStore,
+        original_texts: TextStore,
+        page_numbers: np.ndarray,
+        header: dict,
+    ):
+        self.bm25 = bm25
+        self.chunk_ids = chunk_ids
+        self.texts = texts
+        self.original_texts = original_texts
+        self.page_numbers = page_numbers
+        self.header = header
+
+    @property
+    def version(self) -> str:
+        """Build fingerprint (checksum over every file in the index)."""
+        return str(self.header["checksum"])
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @staticmethod
+    def read_version(directory: Path) -> str:
+        """Checksum of the index currently on disk ("" if there is none)."""
+        header_path = Path(directory) / HEADER_FILE
+        try:
+            with open(header_path) as f:
+                return str(json.load(f).get("checksum", ""))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return ""
+
+    @staticmethod
+    def write(
+        directory: Path,
+        bm25: BM25Index,
+        chunk_ids: list[str],
+        texts: list[str],
+        original_texts: list[str],
+        page_numbers: list[int],
+    ) -> dict:
+        """
+        Write the index into "<dir>.tmp", swap it in with
+        `replace_directory` and return its header.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + ".tmp")
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        weights = bm25.weights
+        index_dtype = np.int32 if weights.nnz < 2**31 else np.int64
+        vocab = sorted(bm25.vocabulary, key=bm25.vocabulary.__getitem__)
+
+        files: list[Path] = []
+        arrays = {
+            "bm25_indptr.npy": weights.indptr.astype(index_dtype),
+            "bm25_indices.npy": weights.indices.astype(index_dtype),
+            "bm25_weights.npy": weights.data.astype(np.float32),
+            "doc_lengths.npy": np.asarray(bm25.doc_lengths, dtype=np.int32),
+            "page_numbers.npy": np.asarray(page_numbers, dtype=np.int32),
+        }
+        for name, array in arrays.items():
+            np.save(tmp_dir / name, array)
+            files.append(tmp_dir / name)
+
+        with open(tmp_dir / "vocab.json", "w") as f:
+            json.dump(vocab, f)
+        files.append(tmp_dir / "vocab.json")
+
+        for name, values in (
+            ("chunk_ids", chunk_ids),
+            ("texts", texts),
+            ("original_texts", original_texts),
+        ):
+            files.extend(TextStore.write(tmp_dir / name, values))
+
+        file_hashes = {
+            path.name: {"sha256": _sha256(path), "bytes": path.stat().st_size}
+            for path in files
+        }
+        checksum = hashlib.sha256(
+            json.dumps(file_hashes, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+        header = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "num_docs": len(chunk_ids),
+            "num_terms": len(vocab),
+            "files": file_hashes,
+            "checksum": checksum,
+        }
+        # Header goes last: a partially written index has none and fails to open
+        with open(tmp_dir / HEADER_FILE, "w") as f:
+            json.dump(header, f, indent=2)
+
+        replace_directory(tmp_dir, directory)
+
+        logger.info(f"✓ Lexical index written to {directory} ({len(chunk_ids)} docs)")
+        return header
+
+    @classmethod
+    def open(cls, directory: Path, verify_checksum: bool = False) -> "LexicalIndex":
+        """
+        Memory-map an index, failing fast on a version or file size mismatch.
+
+        With `verify_checksum` every file is also hashed and compared with
+        the header (reads the whole index; off by default).
+        """
+        directory = Path(directory)
+        header_path = directory / HEADER_FILE
+        if not header_path.exists():
+            raise StaleIndexError(
+                f"Lexical index not found at {directory}; "
+                "run 'python scripts/build_index.py'"
+            )
+
+        with open(header_path) as f:
+            header = json.load(f)
+
+        if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+            raise StaleIndexError(
+                f"Lexical index at {directory} has format "
+                f"{header.get('format')} v{header.get('version')}, expected "
+                f"{FORMAT_NAME} v{FORMAT_VERSION}; rebuild the index"
+            )
+
+        for name, meta in header["files"].items():
+            path = directory / name
+            if not path.exists() or path.stat().st_size != meta["bytes"]:
+                raise StaleIndexError(f"Lexical index file {path} is missing or truncated")
+            if verify_checksum and _sha256(path) != meta["sha256"]:
+                raise StaleIndexError(f"Checksum mismatch for lexical index file {path}")
+
+        def load(name: str) -> np.ndarray:
+            return np.load(directory / name, mmap_mode="r")
+
+        with open(directory / "vocab.json") as f:
+            vocab: list[str] = json.load(f)
+
+        num_docs = int(header["num_docs"])
+        weights = sparse.csr_matrix(
+            (load("bm25_weights.npy"), load("bm25_indices.npy"), load("bm25_indptr.npy")),
+            shape=(len(vocab), num_docs),
+        )
+        bm25 = BM25Index(
+            vocabulary={term: i for i, term in enumerate(vocab)},
+            weights=weights,
+            doc_lengths=load("doc_lengths.npy"),
+        )
+
+        index = cls(
+            bm25=bm25,
+            chunk_ids=TextStore.open(directory / "chunk_ids"),
+            texts=TextStore.open(directory / "texts"),
+            original_texts=TextStore.open(directory / "original_texts"),
+            page_numbers=load("page_numbers.npy"),
+            header=header,
+        )
+        if len(index) != num_docs:
+            raise StaleIndexError(
+                f"Lexical index at {directory} has {len(index)} rows, header says {num_docs}"
+            )
+
+        logger.info(f"✓ Lexical index opened ({num_docs} docs, v{FORMAT_VERSION})")
+        return index
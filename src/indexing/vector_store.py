@@ -0,0 +1,274 @@
+import json
+import logging
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from src.indexing.lexical_index import StaleIndexError, replace_directory
+
+logger = logging.getLogger(__name__)
+
+DENSE_FORMAT_VERSION = 1
+DENSE_DTYPES = ("float32", "float16", "int8")
+
+# Rows scored per block when the stored matrix has to be upcast
+SCORE_BLOCK_ROWS = 65536
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k scores, descending (argpartition + small sort)."""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class ChromaVectorStore:
+    """
+    Dense search through a ChromaDB collection (HNSW, cosine space).
+    """
+
+    def __init__(self, collection, row_by_id: dict[str, int]):
+        self.collection = collection
+        self.row_by_id = row_by_id
+
+    def __len__(self) -> int:
+        return int(self.collection.count())
+
+    def search(
+        self, queries: np.ndarray, top_k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Return (rows, cosine similarities) per query, best first.
+        """
+        results = self.collection.query(
+            query_embeddings=np.atleast_2d(queries).tolist(),
+            n_results=top_k,
+            include=["distances"],
+        )
+
+        output = []
+        for ids, distances in zip(results["ids"], results["distances"]):
+            # Ids upserted by a build still in progress are not in the lexical rows yet
+            known = [i for i, chunk_id in enumerate(ids) if chunk_id in self.row_by_id]
+            rows = np.fromiter(
+                (self.row_by_id[ids[i]] for i in known), dtype=np.int64, count=len(known)
+            )
+            similarities = 1.0 - np.asarray(distances, dtype=np.float32)[known]
+            output.append((rows, similarities))
+        return output
+
+
+class MatrixVectorStore:
+    """
+    In-process cosine search over a memory-mapped normalized embedding matrix.
+
+    Rows are aligned with the lexical index. Search is exact (batched matmul +
+    argpartition) unless the store was written with IVF lists, in which case
+    only the `nprobe` closest lists are scored. The matrix can be stored as
+    float32, float16, or int8 with a per-row scale.
+    """
+
+    def __init__(self, directory: Path, nprobe: int = 8):
+        """
+        Memory-map a store written by `write`.
+        """
+        self.directory = Path(directory)
+        header_path = self.directory / "header.json"
+        if not header_path.exists():
+            raise StaleIndexError(
+                f"Dense index not found at {self.directory}; "
+                "run 'python scripts/build_index.py'"
+            )
+
+        with open(header_path) as f:
+            self.header = json.load(f)
+        if self.header.get("version") != DENSE_FORMAT_VERSION:
+            raise StaleIndexError(
+                f"Dense index at {self.directory} is v{self.header.get('version')}, "
+                f"expected v{DENSE_FORMAT_VERSION}; rebuild the index"
+            )
+
+        self.dtype = self.header["dtype"]
+        self.embeddings = np.load(self.directory / "embeddings.npy", mmap_mode="r")
+        self.scales = (
+            np.load(self.directory / "scales.npy", mmap_mode="r")
+            if self.dtype == "int8"
+            else None
+        )
+
+        self.nprobe = nprobe
+        self.centroids = None
+        if self.header.get("ivf_nlist", 0) > 0:
+            self.centroids = np.load(self.directory / "ivf_centroids.npy")
+            self.ivf_rows = np.load(self.directory / "ivf_rows.npy", mmap_mode="r")
+            self.ivf_offsets = np.load(self.directory / "ivf_offsets.npy")
+
+        logger.info(
+            f"✓ Dense index opened ({len(self)} x {self.embeddings.shape[1]}, "
+            f"{self.dtype}, ivf_nlist={self.header.get('ivf_nlist', 0)})"
+        )
+
+    @property
+    def lexical_version(self) -> str:
+        """Checksum of the lexical index the rows were aligned with."""
+        return str(self.header.get("lexical_version", ""))
+
+    def __len__(self) -> int:
+        return int(self.embeddings.shape[0])
+
+    @staticmethod
+    def write(
+        directory: Path,
+        embeddings: np.ndarray,
+        dtype: str = "float32",
+        ivf_nlist: int = 0,
+        lexical_version: str = "",
+        seed: int = 0,
+    ) -> None:
+        """
+        Write normalized embeddings (row order = lexical index rows).
+        """
+        if dtype not in DENSE_DTYPES:
+            raise ValueError(f"Unknown dense dtype '{dtype}', expected {DENSE_DTYPES}")
+
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + ".tmp")
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(tmp_dir / "embeddings.npy", quantized)
+            np.save(tmp_dir / "scales.npy", scales.astype(np.float32))
+        else:
+            np.save(tmp_dir / "embeddings.npy", matrix.astype(dtype))
+
+        ivf_nlist = min(ivf_nlist, len(matrix))
+        if ivf_nlist > 0:
+            centroids, assignments = _spherical_kmeans(matrix, ivf_nlist, seed=seed)
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.zeros(ivf_nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignments, minlength=ivf_nlist), out=offsets[1:])
+            np.save(tmp_dir / "ivf_centroids.npy", centroids)
+            np.save(tmp_dir / "ivf_rows.npy", order.astype(np.int64))
+            np.save(tmp_dir / "ivf_offsets.npy", offsets)
+
+        header = {
+            "version": DENSE_FORMAT_VERSION,
+            "num_docs": int(matrix.shape[0]),
+            "dimension": int(matrix.shape[1]),
+            "dtype": dtype,
+            "ivf_nlist": int(ivf_nlist),
+            "lexical_version": lexical_version,
+        }
+        with open(tmp_dir / "header.json", "w") as f:
+            json.dump(header, f, indent=2)
+
+        replace_directory(tmp_dir, directory)
+        logger.info(f"✓ Dense index written to {directory} ({dtype}, ivf={ivf_nlist})")
+
+    def _score_rows(self, queries: np.ndarray, rows: np.ndarray | None) -> np.ndarray:
+        """Cosine scores of queries (n_q, d) against all rows or a row subset."""
+        if rows is not None:
+            block = np.asarray(self.embeddings[rows], dtype=np.float32)
+            scores = queries @ block.T
+            if self.scales is not None:
+                scores *= self.scales[rows]
+            return scores
+
+        if self.dtype == "float32":
+            return queries @ np.asarray(self.embeddings).T
+
+        # Upcast float16/int8 block-wise to bound memory
+        n = len(self)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, n)
+            block = np.asarray(self.embeddings[start:end], dtype=np.float32)
+            scores[:, start:end] = queries @ block.T
+            if self.scales is not None:
+                scores[:, start:end] *= self.scales[start:end]
+        return scores
+
+    def search(
+        self, queries: np.ndarray, top_k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Return (rows, cosine similarities) per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        if self.centroids is None:
+            scores = self._score_rows(queries, None)
+            output = []
+            for query_scores in scores:
+                rows = _top_k(query_scores, top_k)
+                output.append((rows, query_scores[rows]))
+            return output
+
+        # IVF: score only the rows of the nprobe closest lists
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        output = []
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate(
+                [
+                    self.ivf_rows[self.ivf_offsets[i] : self.ivf_offsets[i + 1]]
+                    for i in lists
+                ]
+            )
+            candidates.sort()
+            query_scores = self._score_rows(query[None, :], candidates)[0]
+            best = _top_k(query_scores, top_k)
+            output.append((candidates[best], query_scores[best]))
+        return output
+
+
+def _spherical_kmeans(
+    matrix: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Cosine k-means for IVF lists; returns (unit centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)].copy()
+
+    assignments = np.zeros(len(matrix), dtype=np.int64)
+    for _ in range(n_iter):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = matrix[assignments == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[c] = centroid / np.linalg.norm(centroid)
+    return centroids.astype(np.float32), assignments
+
+
+def export_chroma_embeddings(collection, chunk_ids: list[str]) -> np.ndarray:
+    """Fetch stored embeddings from ChromaDB in the given (lexical row) order."""
+    embeddings: np.ndarray | None = None
+    batch_size = 1000
+    for start in range(0, len(chunk_ids), batch_size):
+        batch_ids = chunk_ids[start : start + batch_size]
+        result = collection.get(ids=batch_ids, include=["embeddings"])
+        batch = np.asarray(result["embeddings"], dtype=np.float32)
+        if embeddings is None:
+            # Preallocate once the dimension is known; filled batch by batch
+            embeddings = np.empty((len(chunk_ids), batch.shape[1]), dtype=np.float32)
+        position = {chunk_id: i for i, chunk_id in enumerate(result["ids"])}
+        embeddings[start : start + len(batch_ids)] = batch[
+            [position[chunk_id] for chunk_id in batch_ids]
+        ]
+    if embeddings is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return embeddings
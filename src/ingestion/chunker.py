@@ -1,20 +1,33 @@
 import json
 import logging
-from dataclasses import asdict, dataclass
+import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+FORMAT_NAME = "boeing-737-rag/chunks"
+FORMAT_VERSION = 1
 
-@dataclass
+
+@dataclass(slots=True)
 class Chunk:
-    """Child chunk with parent page reference."""
+    """
+    Child chunk with parent page reference.
+
+    Chunks of one page share a single `parent_page_text` string object.
+    Chunkers that cut spans of the page text also record the span's
+    character offsets, so stores can keep offsets instead of the text.
+    """
 
     chunk_id: str
     text: str
     contextualized_text: str
     page_number: int
     parent_page_text: str
+    char_start: int | None = None
+    char_end: int | None = None
 
 
 class Chunker:
@@ -32,12 +45,19 @@ class Chunker:
 
         all_chunks = []
         for page_num, page_text in pages.items():
-            page_chunks = self._split_text(page_text, page_num, page_text)
-            all_chunks.extend(page_chunks)
+            all_chunks.extend(self.chunk_page(page_num, page_text))
 
         logger.info(f"Created {len(all_chunks)} chunks")
         return all_chunks
 
+    def chunk_elements(self, page_num: int, elements: list) -> list[Chunk]:
+        """Create child chunks for one page from its ParsedElements."""
+        return self.chunk_page(page_num, "\n\n".join(elem.text for elem in elements))
+
+    def chunk_page(self, page_num: int, page_text: str) -> list[Chunk]:
+        """Create child chunks for one parent page."""
+        return self._split_text(page_text, page_num, page_text)
+
     def _split_text(self, text: str, page_num: int, parent: str) -> list[Chunk]:
         """Split text into overlapping chunks."""
         chunks = []
@@ -76,16 +96,151 @@ class Chunker:
 
         return chunks
 
-    def save(self, chunks: list[Chunk], path: str):
-        """Save chunks to JSON."""
-        Path(path).parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "w") as f:
-            json.dump([asdict(c) for c in chunks], f, indent=2)
-        logger.info(f"Saved {len(chunks)} chunks to {path}")
+    @staticmethod
+    def save(chunks: Iterable[Chunk], path: str):
+        """Save chunks to the JSONL chunk store (see `ChunkWriter`)."""
+        with ChunkWriter(path) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        logger.info(f"Saved {writer.chunks} chunks ({writer.pages} pages) to {path}")
 
     @staticmethod
     def load(path: str) -> list[Chunk]:
-        """Load chunks from JSON."""
+        """Load all chunks from a chunk store."""
+        return list(Chunker.iter_chunks(path))
+
+    @staticmethod
+    def iter_chunks(path: str) -> Iterator[Chunk]:
+        """
+        Stream chunks from a chunk store, one line at a time.
+
+        Page texts are decoded once and shared by the page's chunks; only
+        the current page's text is kept, since each page record directly
+        precedes its chunks.
+        """
+        page_number: int | None = None
+        page_text = ""
         with open(path) as f:
-            data = json.load(f)
-        return [Chunk(**item) for item in data]
+            header = json.loads(f.readline() or "{}")
+            if (
+                header.get("format") != FORMAT_NAME
+                or header.get("version") != FORMAT_VERSION
+            ):
+                raise ValueError(
+                    f"{path} is not a {FORMAT_NAME} v{FORMAT_VERSION} file; "
+                    "re-run ingestion to regenerate it"
+                )
+
+            for line in f:
+                record = json.loads(line)
+                if record["type"] == "page":
+                    page_number, page_text = record["page_number"], record["text"]
+                    continue
+
+                if record["page_number"] != page_number:
+                    raise ValueError(
+                        f"{path}: chunk {record['chunk_id']} does not follow "
+                        f"its page record"
+                    )
+                char_start, char_end = record.get("span", (None, None))
+                if char_start is not None:
+                    text = page_text[char_start:char_end]
+                else:
+                    text = record.get("text", page_text)
+                if "context" in record:
+                    contextualized_text = f"{record['context']}\n\n{text}"
+                else:
+                    contextualized_text = record["contextualized_text"]
+
+                yield Chunk(
+                    chunk_id=record["chunk_id"],
+                    text=text,
+                    contextualized_text=contextualized_text,
+                    page_number=record["page_number"],
+                    parent_page_text=page_text,
+                    char_start=char_start,
+                    char_end=char_end,
+                )
+
+
+class ChunkWriter:
+    """
+    Incremental writer for the JSONL chunk store.
+
+    Line 1 is a format header; a page's text is written as a
+    {"type": "page"} record just before its chunks (again if they are
+    interleaved with another page's), and chunk records refer to it by page
+    number instead of repeating it. A chunk's "text" is omitted when it is
+    the whole page or a recorded "span" of it, and only the generated
+    "context" of its contextualized text is stored. Chunks can be written
+    one at a time as they are produced. The store is written to a ".tmp"
+    file that replaces `path` only when the writer closes without an error.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.pages = 0
+        self.chunks = 0
+        self._page_hashes: dict[int, int] = {}
+        self._current_page: int | None = None
+        self._file = None
+
+    def __enter__(self) -> "ChunkWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, "w")
+        self._write_line({"format": FORMAT_NAME, "version": FORMAT_VERSION})
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+    def write(self, chunk: Chunk) -> None:
+        # Spans are offsets into the page record, so a page's text must not change
+        page_hash = hash(chunk.parent_page_text)
+        known_hash = self._page_hashes.get(chunk.page_number)
+        if known_hash is not None and known_hash != page_hash:
+            raise ValueError(
+                f"Page {chunk.page_number} arrived again with a different text "
+                f"(chunk {chunk.chunk_id})"
+            )
+
+        if chunk.page_number != self._current_page:
+            self._current_page = chunk.page_number
+            self._write_line(
+                {
+                    "type": "page",
+                    "page_number": chunk.page_number,
+                    "text": chunk.parent_page_text,
+                }
+            )
+            if known_hash is None:
+                self._page_hashes[chunk.page_number] = page_hash
+                self.pages += 1
+
+        record = {
+            "type": "chunk",
+            "chunk_id": chunk.chunk_id,
+            "page_number": chunk.page_number,
+        }
+        # Spans and whole-page chunks reuse the page record's text
+        if chunk.char_start is not None:
+            record["span"] = [chunk.char_start, chunk.char_end]
+        elif chunk.text != chunk.parent_page_text:
+            record["text"] = chunk.text
+        # Contextualized text is "<context>\n\n<text>": store only the context
+        suffix = f"\n\n{chunk.text}"
+        if chunk.contextualized_text.endswith(suffix):
+            record["context"] = chunk.contextualized_text[: -len(suffix)]
+        else:
+            record["contextualized_text"] = chunk.contextualized_text
+
+        self._write_line(record)
+        self.chunks += 1
+
+    def _write_line(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ContextCache:
+    """
+    Persistent, content-addressed store of generated chunk contexts (SQLite).
+
+    Entries are keyed by a hash of everything that determines the Gemini
+    output, and each one is committed as soon as it arrives, so an
+    interrupted run resumes where it stopped and unchanged chunks are never
+    sent to the API again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contexts ("
+            " key TEXT PRIMARY KEY,"
+            " chunk_id TEXT NOT NULL,"
+            " context TEXT NOT NULL,"
+            " created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+        )
+        self._conn.commit()
+
+        logger.info(f"Context cache at {self.path} ({len(self)} entries)")
+
+    @staticmethod
+    def key(
+        chunk_text: str,
+        page_number: int,
+        page_prefix: str,
+        prompt_template: str,
+        model_name: str,
+    ) -> str:
+        """Content hash identifying one context generation."""
+        payload = json.dumps(
+            [chunk_text, page_number, page_prefix, prompt_template, model_name]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Cached context for a key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT context FROM contexts WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, chunk_id: str, context: str) -> None:
+        """Store a context and commit immediately."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contexts (key, chunk_id, context) VALUES (?, ?, ?)",
+                (key, chunk_id, context),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
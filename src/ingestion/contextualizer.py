@@ -1,5 +1,9 @@
 import logging
+import threading
 import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
@@ -12,9 +16,30 @@ from tenacity import (
 from tqdm import tqdm
 
 from src.ingestion.chunker import Chunk
+from src.ingestion.context_cache import ContextCache
+from src.ingestion.rate_limit import AdaptiveConcurrency, RateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Expected response size, reserved from the TPM budget with the prompt
+CONTEXT_OUTPUT_TOKENS = 150
+
+# Characters of the parent page shown to the model
+PAGE_PREFIX_CHARS = 500
+
+PROMPT_TEMPLATE = (
+    "This is a chunk from Boeing 737 Operations Manual, "
+    "Page {page_number}.\n\n"
+    "Page context (first 500 chars):\n"
+    "{page_prefix}...\n\n"
+    "Chunk:\n"
+    "{chunk_text}\n\n"
+    "Provide 2-3 sentences of context explaining:\n"
+    "1. What procedure/section this relates to\n"
+    "2. Key technical terms or components\n"
+    "Keep it concise and technical. Context only, no preamble."
+)
+
 
 def log_retry(retry_state):
     """Log tenacity retry attempts."""
@@ -24,29 +49,139 @@ def log_retry(retry_state):
         f"(Attempt {retry_state.attempt_number})"
     )
 
+    # Shrink concurrency when the API pushes back with a 429
+    instance = retry_state.args[0] if retry_state.args else None
+    exception = retry_state.outcome.exception()
+    if isinstance(instance, Contextualizer) and isinstance(
+        exception, google_exceptions.ResourceExhausted
+    ):
+        instance.concurrency.on_throttle()
+
 
 class Contextualizer:
     """Add contextual information to chunks using Gemini."""
 
-    def __init__(self, api_key: str, requests_per_minute: int = 50):
+    def __init__(
+        self,
+        api_key: str,
+        requests_per_minute: int = 50,
+        tokens_per_minute: int = 1_000_000,
+        max_concurrency: int = 8,
+        model_name: str = "gemini-2.5-pro",
+        cache_path: str | None = None,
+    ):
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-pro")
-        # Proactive throttle: add buffer to 60 RPM limit
-        self.delay_seconds = 60.0 / requests_per_minute
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+        # Persistent context cache (None disables it)
+        self.cache = ContextCache(cache_path) if cache_path else None
+        self.cache_hits = 0
+        self._lock = threading.Lock()  # guards cache_hits across worker threads
+
+        # Shared RPM/TPM budget for all in-flight calls
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_limit=max_concurrency)
 
     def add_context(self, chunks: list[Chunk], batch_size: int = 10) -> list[Chunk]:
         """Add context to chunks for better retrieval."""
-        logger.info(f"Adding context to {len(chunks)} chunks")
+        logger.info(
+            f"Adding context to {len(chunks)} chunks "
+            f"(max_concurrency={self.concurrency.max_limit})"
+        )
 
-        for chunk in tqdm(chunks, desc="Adding context", unit="chunk"):
-            time.sleep(self.delay_seconds)
+        start = time.monotonic()
+        with (
+            ThreadPoolExecutor(max_workers=self.concurrency.max_limit) as executor,
+            tqdm(total=len(chunks), desc="Adding context", unit="chunk") as progress,
+        ):
+            futures = [executor.submit(self._contextualize, chunk) for chunk in chunks]
 
-            context = self._generate_context(chunk)
-            chunk.contextualized_text = f"{context}\n\n{chunk.text}"
+            for future in as_completed(futures):
+                future.result()
+                progress.update(1)
+
+                elapsed_minutes = (time.monotonic() - start) / 60.0
+                progress.set_postfix(
+                    rpm=f"{progress.n / elapsed_minutes:.0f}" if elapsed_minutes else "-",
+                    concurrency=self.concurrency.limit,
+                )
 
-        logger.info("Context generation complete")
+        logger.info(
+            f"Context generation complete "
+            f"({self.cache_hits}/{len(chunks)} served from cache)"
+        )
         return chunks
 
+    def iter_context(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """
+        Contextualize a stream of chunks, yielding them in input order.
+
+        At most two windows of `max_concurrency` chunks are in flight, so
+        memory stays bounded however long the input stream is.
+        """
+        window = 2 * self.concurrency.max_limit
+        in_flight: deque[tuple[Chunk, Future]] = deque()
+
+        with (
+            ThreadPoolExecutor(max_workers=self.concurrency.max_limit) as executor,
+            tqdm(desc="Adding context", unit="chunk") as progress,
+        ):
+            for chunk in chunks:
+                in_flight.append((chunk, executor.submit(self._contextualize, chunk)))
+                if len(in_flight) >= window:
+                    done, future = in_flight.popleft()
+                    future.result()
+                    progress.update(1)
+                    yield done
+
+            while in_flight:
+                done, future = in_flight.popleft()
+                future.result()
+                progress.update(1)
+                yield done
+
+        logger.info(
+            f"Context generation complete "
+            f"({self.cache_hits}/{progress.n} served from cache)"
+        )
+
+    def _cache_key(self, chunk: Chunk) -> str:
+        """Content hash of everything that determines the generated context."""
+        return ContextCache.key(
+            chunk.text,
+            chunk.page_number,
+            chunk.parent_page_text[:PAGE_PREFIX_CHARS],
+            PROMPT_TEMPLATE,
+            self.model_name,
+        )
+
+    def _contextualize(self, chunk: Chunk) -> None:
+        """Attach context for one chunk, from cache or a rate-limited call."""
+        cache_key = self._cache_key(chunk)
+        context = self.cache.get(cache_key) if self.cache is not None else None
+
+        if context is not None:
+            with self._lock:
+                self.cache_hits += 1
+        else:
+            context = self._generate_context(chunk)
+            if context is None:
+                # Permanent failures are not cached so the next run retries them
+                context = f"Boeing 737 manual content from page {chunk.page_number}"
+            elif self.cache is not None:
+                self.cache.put(cache_key, chunk.chunk_id, context)
+
+        chunk.contextualized_text = f"{context}\n\n{chunk.text}"
+
+    def _build_prompt(self, chunk: Chunk) -> str:
+        """Prompt asking for 2-3 sentences of situating context."""
+        return PROMPT_TEMPLATE.format(
+            page_number=chunk.page_number,
+            page_prefix=chunk.parent_page_text[:PAGE_PREFIX_CHARS],
+            chunk_text=chunk.text,
+        )
+
     @retry(
         retry=retry_if_exception_type(
             (
@@ -57,27 +192,32 @@ class Contextualizer:
         wait=wait_exponential(multiplier=2, min=5, max=60),
         stop=stop_after_attempt(5),
         before_sleep=log_retry,
+        reraise=True,
     )
-    def _generate_context(self, chunk: Chunk) -> str:
-        """Generate 2-3 sentence context for a chunk."""
-        prompt = (
-            f"This is a chunk from Boeing 737 Operations Manual, "
-            f"Page {chunk.page_number}.\n\n"
-            f"Page context (first 500 chars):\n"
-            f"{chunk.parent_page_text[:500]}...\n\n"
-            f"Chunk:\n"
-            f"{chunk.text}\n\n"
-            "Provide 2-3 sentences of context explaining:\n"
-            "1. What procedure/section this relates to\n"
-            "2. Key technical terms or components\n"
-            "Keep it concise and technical. Context only, no preamble."
-        )
-
+    def _call_model(self, prompt: str) -> str:
+        """
+        One rate-limited Gemini call, retried on 429/503. Each attempt takes
+        its own concurrency slot and RPM/TPM claim; neither is held while
+        backing off.
+        """
+        self.concurrency.acquire()
         try:
+            self.rate_limiter.acquire(len(prompt) // 4 + CONTEXT_OUTPUT_TOKENS)
             response = self.model.generate_content(prompt)
             return str(response.text.strip())
+        finally:
+            self.concurrency.release()
+
+    def _generate_context(self, chunk: Chunk) -> str | None:
+        """Generate 2-3 sentence context for a chunk (None once retries are spent)."""
+        try:
+            context = self._call_model(self._build_prompt(chunk))
         except Exception as e:
+            if isinstance(e, google_exceptions.ResourceExhausted):
+                self.concurrency.on_throttle()
             logger.error(
                 f"Context generation FAILED permanently for {chunk.chunk_id}: {e}"
             )
-            return f"Boeing 737 manual content from page {chunk.page_number}"
+            return None
+        self.concurrency.on_success()
+        return context
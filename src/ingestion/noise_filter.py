@@ -0,0 +1,186 @@
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Running headers/footers and boilerplate of the Boeing 737 FCOM
+DEFAULT_NOISE_PATTERNS = [
+    r"Copyright © The Boeing Company",
+    r"^DO NOT USE FOR FLIGHT$",
+    r"^Boeing 737 Operations Manual$",
+    r"See title page for details",
+    r"D6-27370-TBC",
+    r"FCOM Template",
+    r"^\[Option.*\]$",
+    r"^(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}$",
+    r"^Normal Procedures Chapter NP",
+    r"^Table of Contents",
+    r"^Normal Procedures\s*-\s*$",
+    r"^Introduction\s*$",
+]
+
+# Plain substrings that mark noise (table-of-contents leaders)
+DEFAULT_NOISE_LITERALS = [". . . . ."]
+
+# Images to skip (header logos, decorative elements)
+DEFAULT_SKIP_IMAGE_TEXTS = [
+    "DO NOT USE FOR FLIGHT",
+    "Boeing 737 Operations Manual",
+]
+
+# Regex metacharacters: a rule without any of them is a plain substring
+REGEX_METACHARACTERS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def _compile(patterns: dict[int, str], flags: int = 0) -> re.Pattern | None:
+    """One alternation with a named group per rule id (None if empty)."""
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(f"(?P<r{rule_id}>{pattern})" for rule_id, pattern in patterns.items()),
+        flags,
+    )
+
+
+class NoiseFilter:
+    """
+    Single-pass matcher for boilerplate elements and header/logo images.
+
+    Rules of a document are compiled once into three matchers, each run at
+    most once per element:
+      - rules anchored with "^" are combined into one regex tried only at
+        the start of the element (so "^a|b" matches "b" only at the start);
+      - plain-text rules become case-insensitive substring checks on the
+        lower-cased element, which beat a regex alternation in CPython;
+      - remaining regexes are combined into one case-insensitive search.
+    Noise literals are case-sensitive substrings. Per-rule hit counts and
+    the time spent matching are recorded.
+
+    Pattern sets are per document, as JSON:
+        {
+          "noise_patterns": ["^Table of Contents", ...],   case-insensitive regex
+          "noise_literals": [". . . . ."],                 case-sensitive substrings
+          "skip_image_texts": ["DO NOT USE FOR FLIGHT"]    case-insensitive substrings
+        }
+    Missing keys fall back to the built-in Boeing 737 rules.
+    """
+
+    def __init__(
+        self,
+        noise_patterns: list[str] | None = None,
+        noise_literals: list[str] | None = None,
+        skip_image_texts: list[str] | None = None,
+    ):
+        noise_patterns = list(
+            DEFAULT_NOISE_PATTERNS if noise_patterns is None else noise_patterns
+        )
+        noise_literals = list(
+            DEFAULT_NOISE_LITERALS if noise_literals is None else noise_literals
+        )
+        self.skip_image_texts = list(
+            DEFAULT_SKIP_IMAGE_TEXTS if skip_image_texts is None else skip_image_texts
+        )
+        self.rules = noise_patterns + noise_literals
+
+        anchored: dict[int, str] = {}
+        searched: dict[int, str] = {}
+        self._substrings: list[tuple[int, str]] = []
+        for rule_id, pattern in enumerate(noise_patterns):
+            if pattern.startswith("^"):
+                anchored[rule_id] = pattern
+            elif REGEX_METACHARACTERS.search(pattern):
+                searched[rule_id] = pattern
+            else:
+                self._substrings.append((rule_id, pattern.lower()))
+        self._anchored = _compile(anchored, re.IGNORECASE)
+        self._searched = _compile(searched, re.IGNORECASE)
+        self._literals = list(enumerate(noise_literals, len(noise_patterns)))
+
+        self._image_substrings = [
+            (rule_id, text.lower()) for rule_id, text in enumerate(self.skip_image_texts)
+        ]
+
+        self._lock = threading.Lock()
+        self._hits = [0] * len(self.rules)
+        self._image_hits = [0] * len(self.skip_image_texts)
+        self._checked = 0
+        self._seconds = 0.0
+
+    @classmethod
+    def from_file(cls, path: str) -> "NoiseFilter":
+        """Load a per-document pattern set (see class docstring)."""
+        with open(Path(path)) as f:
+            config = json.load(f)
+
+        noise_filter = cls(
+            noise_patterns=config.get("noise_patterns"),
+            noise_literals=config.get("noise_literals"),
+            skip_image_texts=config.get("skip_image_texts"),
+        )
+        logger.info(
+            f"Loaded {len(noise_filter.rules)} noise rules and "
+            f"{len(noise_filter.skip_image_texts)} image rules from {path}"
+        )
+        return noise_filter
+
+    def is_noise(self, text: str) -> bool:
+        """Check if text is noise."""
+        start = time.perf_counter()
+        rule_id = self._match_noise(text)
+        self._record(self._hits, rule_id, time.perf_counter() - start)
+        return rule_id is not None
+
+    def is_header_image(self, text: str) -> bool:
+        """Check if image text belongs to a header/logo."""
+        start = time.perf_counter()
+        lowered = text.lower()
+        rule_id = next(
+            (rule_id for rule_id, s in self._image_substrings if s in lowered), None
+        )
+        self._record(self._image_hits, rule_id, time.perf_counter() - start)
+        return rule_id is not None
+
+    def _match_noise(self, text: str) -> int | None:
+        """Id of the first noise rule matching text, or None."""
+        if self._anchored is not None:
+            match = self._anchored.match(text)
+            if match is not None:
+                return int(match.lastgroup[1:])
+
+        if self._substrings:
+            lowered = text.lower()
+            for rule_id, substring in self._substrings:
+                if substring in lowered:
+                    return rule_id
+
+        for rule_id, literal in self._literals:
+            if literal in text:
+                return rule_id
+
+        if self._searched is not None:
+            match = self._searched.search(text)
+            if match is not None:
+                return int(match.lastgroup[1:])
+
+        return None
+
+    def _record(self, hits: list[int], rule_id: int | None, seconds: float) -> None:
+        with self._lock:
+            self._checked += 1
+            self._seconds += seconds
+            if rule_id is not None:
+                hits[rule_id] += 1
+
+    def stats(self) -> dict:
+        """Checks performed, matching time and hit counts per rule."""
+        with self._lock:
+            return {
+                "checks": self._checked,
+                "seconds": self._seconds,
+                "noise_hits": dict(zip(self.rules, self._hits)),
+                "image_hits": dict(zip(self.skip_image_texts, self._image_hits)),
+            }
@@ -1,13 +1,35 @@
+import hashlib
 import json
 import logging
 import re
-from dataclasses import asdict, dataclass
+import tempfile
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, replace
+from importlib.metadata import version
 from pathlib import Path
 
+from pypdf import PdfReader, PdfWriter
 from unstructured.partition.pdf import partition_pdf
 
+from src.ingestion.noise_filter import NoiseFilter
+
 logger = logging.getLogger(__name__)
 
+PARSE_STRATEGIES = ("fast", "hi_res", "ocr_only")
+
+# partition_pdf options besides the strategy; part of every page cache key
+PARTITION_OPTIONS = {"infer_table_structure": True}
+UNSTRUCTURED_VERSION = version("unstructured")
+
+# Lines shorter than this count towards the columnar-layout signal
+SHORT_LINE_CHARS = 25
+
+# Path construction operators used for table rulings: rectangles and lines
+RULE_OPERATOR = re.compile(rb"\s(?:re|l)\s")
+
 
 @dataclass
 class ParsedElement:
@@ -18,82 +40,263 @@ class ParsedElement:
     element_type: str
 
 
+@dataclass
+class PageSignals:
+    """Cheap per-page features used to pick a partition strategy."""
+
+    text_chars: int
+    images: list[str]  # digests of image XObjects
+    rule_ops: int
+    short_line_ratio: float
+
+
 class PDFParser:
     """Parse PDF maintaining page numbers and structure."""
 
-    NOISE_PATTERNS = [
-        r"Copyright © The Boeing Company",
-        r"^DO NOT USE FOR FLIGHT$",
-        r"^Boeing 737 Operations Manual$",
-        r"See title page for details",
-        r"D6-27370-TBC",
-        r"FCOM Template",
-        r"^\[Option.*\]$",
-        r"^(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}$",
-        r"^Normal Procedures Chapter NP",
-        r"^Table of Contents",
-        r"^Normal Procedures\s*-\s*$",
-        r"^Introduction\s*$",
-    ]
-
-    # Images to skip (header logos, decorative elements)
-    SKIP_IMAGE_TEXTS = [
-        "DO NOT USE FOR FLIGHT",
-        "Boeing 737 Operations Manual",
-    ]
-
-    def __init__(self, pdf_path: str):
+    # Page routing signals (strategy="auto")
+    MIN_TEXT_CHARS = 50  # less text than this: no usable text layer
+    TABLE_RULE_OPS = 12  # rectangle/line operators drawn by table rulings
+    TABLE_SHORT_LINE_RATIO = 0.6  # share of short lines in columnar layouts
+    REPEATED_IMAGE_PAGES = 3  # images on more pages than this are decoration
+
+    def __init__(
+        self,
+        pdf_path: str,
+        workers: int = 1,
+        pages_per_task: int = 8,
+        cache_dir: str | None = None,
+        strategy: str = "auto",
+        noise_filter: NoiseFilter | None = None,
+    ):
         self.pdf_path = Path(pdf_path)
         if not self.pdf_path.exists():
             raise FileNotFoundError(f"PDF not found: {pdf_path}")
 
+        if strategy != "auto" and strategy not in PARSE_STRATEGIES:
+            raise ValueError(
+                f"Unknown parse strategy {strategy!r}; "
+                f"expected 'auto' or one of {PARSE_STRATEGIES}"
+            )
+        self.strategy = strategy
+        self.noise_filter = noise_filter or NoiseFilter()
+        self.last_parse_stats: dict = {}
+
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
     def parse(self) -> list[ParsedElement]:
         """Extract elements with page numbers from PDF."""
         logger.info(f"Parsing {self.pdf_path}")
 
-        elements = partition_pdf(
-            filename=str(self.pdf_path),
-            strategy="hi_res",
-            infer_table_structure=True,
+        parsed = [elem for _, elements in self.iter_pages() for elem in elements]
+
+        logger.info(
+            f"Parsed {len(parsed)} elements from {len(set(e.page_number for e in parsed))} pages"
+        )
+        return parsed
+
+    def iter_pages(self) -> Iterator[tuple[int, list[ParsedElement]]]:
+        """
+        Filtered elements page by page, in page order, as soon as each page
+        is partitioned (pages left with no elements are skipped).
+        """
+        for page_num, raw_elements in self._iter_raw_pages():
+            elements = self._filter_elements(raw_elements)
+            if elements:
+                yield page_num, elements
+
+        stats = self.noise_filter.stats()
+        fired = {rule: hits for rule, hits in stats["noise_hits"].items() if hits}
+        logger.info(
+            f"Noise filter: {stats['checks']} checks in {stats['seconds'] * 1000:.1f}ms, "
+            f"rule hits {fired}"
+        )
+
+    def _iter_raw_pages(self) -> Iterator[tuple[int, list[ParsedElement]]]:
+        """
+        Raw (unfiltered) elements per page, in page order.
+
+        Each page is routed to a strategy, then served from the per-page
+        cache when its content hash is known; the rest are split into
+        contiguous same-strategy page ranges and partitioned in a process
+        pool. Ranges are consumed in page order, so early pages are yielded
+        while later ranges are still being partitioned.
+        """
+        reader = PdfReader(str(self.pdf_path))
+        num_pages = len(reader.pages)
+        strategies = self._route_pages(reader)
+        page_keys = {
+            page_num: _page_cache_key(page, strategies[page_num])
+            for page_num, page in enumerate(reader.pages, 1)
+        }
+
+        by_page: dict[int, list[ParsedElement]] = {}
+        for page_num, key in page_keys.items():
+            cached = self._load_cached_page(key)
+            if cached is not None:
+                # Identical pages share a cache entry; elements follow this page
+                by_page[page_num] = [
+                    replace(elem, page_number=page_num) for elem in cached
+                ]
+        cached_pages = len(by_page)
+
+        tasks: list[tuple[str, int, int]] = []
+        for strategy in PARSE_STRATEGIES:
+            missing = [
+                p
+                for p in range(1, num_pages + 1)
+                if p not in by_page and strategies[p] == strategy
+            ]
+            tasks.extend(
+                (strategy, first, last)
+                for first, last in _page_ranges(missing, self.pages_per_task)
+            )
+        tasks.sort(key=lambda task: task[1])
+
+        logger.info(
+            f"{cached_pages}/{num_pages} pages from cache, "
+            f"partitioning {num_pages - cached_pages} pages in {len(tasks)} ranges "
+            f"(workers={self.workers})"
         )
 
+        stats = {
+            strategy: {"pages": 0, "seconds": 0.0} for strategy in PARSE_STRATEGIES
+        }
+        with ExitStack() as stack:
+            if self.workers > 1 and len(tasks) > 1:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=self.workers)
+                )
+                results = executor.map(
+                    _partition_page_range,
+                    [str(self.pdf_path)] * len(tasks),
+                    [first for _, first, _ in tasks],
+                    [last for _, _, last in tasks],
+                    [strategy for strategy, _, _ in tasks],
+                )
+            else:
+                results = (
+                    _partition_page_range(str(self.pdf_path), first, last, strategy)
+                    for strategy, first, last in tasks
+                )
+            pending = zip(tasks, results)
+
+            for page_num in range(1, num_pages + 1):
+                if page_num not in by_page:
+                    # First uncached page starts the next range (tasks are sorted)
+                    (strategy, first, last), (elements, seconds) = next(pending)
+                    stats[strategy]["pages"] += last - first + 1
+                    stats[strategy]["seconds"] += seconds
+
+                    range_pages: dict[int, list[ParsedElement]] = {
+                        p: [] for p in range(first, last + 1)
+                    }
+                    for elem in elements:
+                        # Elements without a page number stay with the range's first page
+                        page = elem.page_number if elem.page_number in range_pages else first
+                        range_pages[page].append(replace(elem, page_number=page))
+                    for range_page, page_elements in range_pages.items():
+                        by_page[range_page] = page_elements
+                        self._store_cached_page(page_keys[range_page], page_elements)
+
+                yield page_num, by_page.pop(page_num)
+
+        self.last_parse_stats = {"cached_pages": cached_pages, **stats}
+        for strategy, strategy_stats in stats.items():
+            if strategy_stats["pages"]:
+                logger.info(
+                    f"  {strategy}: {strategy_stats['pages']} pages, "
+                    f"{strategy_stats['seconds']:.1f}s worker time"
+                )
+
+    def _route_pages(self, reader: PdfReader) -> dict[int, str]:
+        """
+        Partition strategy per page (1-based).
+
+        With strategy="auto", pages with a clean text layer and no table
+        ruling or content images use "fast"; pages with little or no text
+        but images are treated as scans ("ocr_only"); everything else gets
+        "hi_res" layout detection. Images repeated on many pages (logos,
+        headers) do not count as content.
+        """
+        if self.strategy != "auto":
+            return {p: self.strategy for p in range(1, len(reader.pages) + 1)}
+
+        signals = {
+            page_num: _page_signals(page)
+            for page_num, page in enumerate(reader.pages, 1)
+        }
+
+        image_pages: dict[str, int] = {}
+        for page_signals in signals.values():
+            for digest in set(page_signals.images):
+                image_pages[digest] = image_pages.get(digest, 0) + 1
+
+        strategies = {}
+        for page_num, page_signals in signals.items():
+            content_images = [
+                d for d in page_signals.images if image_pages[d] <= self.REPEATED_IMAGE_PAGES
+            ]
+            if page_signals.text_chars < self.MIN_TEXT_CHARS:
+                strategies[page_num] = "ocr_only" if content_images else "fast"
+            elif (
+                content_images
+                or page_signals.rule_ops >= self.TABLE_RULE_OPS
+                or page_signals.short_line_ratio >= self.TABLE_SHORT_LINE_RATIO
+            ):
+                strategies[page_num] = "hi_res"
+            else:
+                strategies[page_num] = "fast"
+
+        counts = {s: list(strategies.values()).count(s) for s in PARSE_STRATEGIES}
+        logger.info(f"Page routing: {counts}")
+        return strategies
+
+    def _filter_elements(self, elements: list[ParsedElement]) -> list[ParsedElement]:
+        """Drop noise, header images and trivial diagrams."""
         parsed = []
 
         for elem in elements:
-            text = str(elem).strip()
+            text = elem.text
 
-            if not text or len(text) < 10 or self._is_noise(text):
+            if not text or len(text) < 10 or self.noise_filter.is_noise(text):
                 continue
 
-            page_num = (
-                elem.metadata.page_number
-                if hasattr(elem.metadata, "page_number")
-                else 1
-            )
-            elem_type = self._get_type(elem)
-
             # Skip header/logo images
-            if elem_type == "image" and self._is_header_image(text):
+            if elem.element_type == "image" and self.noise_filter.is_header_image(text):
                 continue
 
             # Keep only meaningful diagrams (longer descriptions)
-            if elem_type == "image":
+            if elem.element_type == "image":
                 if len(text) < 20:  # Skip small/simple images
                     continue
 
-            parsed.append(
-                ParsedElement(
-                    text=text, 
-                    page_number=page_num if page_num is not None else 0,
-                    element_type=elem_type)
-            )
+            parsed.append(elem)
 
-        logger.info(
-            f"Parsed {len(parsed)} elements from {len(set(e.page_number for e in parsed))} pages"
-        )
         return parsed
 
-    def _get_type(self, element) -> str:
+    def _load_cached_page(self, key: str) -> list[ParsedElement] | None:
+        """Cached raw elements for a page hash, if present."""
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return [ParsedElement(**item) for item in json.load(f)]
+
+    def _store_cached_page(self, key: str, elements: list[ParsedElement]) -> None:
+        """Persist raw elements of one page under its content hash."""
+        if self.cache_dir is None:
+            return
+        with open(self.cache_dir / f"{key}.json", "w") as f:
+            json.dump([asdict(e) for e in elements], f)
+
+    @staticmethod
+    def _get_type(element) -> str:
         """Determine element type."""
         name = type(element).__name__
         if "Image" in name:
@@ -106,24 +309,6 @@ class PDFParser:
             return "title"
         return "text"
 
-    def _is_noise(self, text: str) -> bool:
-        """Check if text is noise."""
-        for pattern in self.NOISE_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-
-        if ". . . . ." in text:
-            return True
-
-        return False
-
-    def _is_header_image(self, text: str) -> bool:
-        """Check if image is a header/logo."""
-        for skip_text in self.SKIP_IMAGE_TEXTS:
-            if skip_text.lower() in text.lower():
-                return True
-        return False
-
     def save(self, elements: list[ParsedElement], path: str):
         """Save elements to JSON."""
         Path(path).parent.mkdir(parents=True, exist_ok=True)
@@ -132,12 +317,125 @@ class PDFParser:
         logger.info(f"Saved to {path}")
 
 
-def group_by_page(elements: list[ParsedElement]) -> dict[int, str]:
-    """Group elements by page and concatenate text."""
-    pages: dict[int, list[str]] = {}
+def _page_cache_key(page, strategy: str) -> str:
+    """
+    Hash of a page's content stream and embedded XObjects, the parse
+    strategy, the partition options and the unstructured version.
+    """
+    digest = hashlib.sha256(
+        json.dumps(
+            [strategy, PARTITION_OPTIONS, UNSTRUCTURED_VERSION], sort_keys=True
+        ).encode("utf-8")
+    )
+    digest.update(str(page.mediabox).encode("utf-8"))
+
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if xobjects:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            digest.update(name.encode("utf-8"))
+            digest.update(xobjects[name].get_object().get_data())
+
+    return digest.hexdigest()
+
+
+def _page_signals(page) -> PageSignals:
+    """Text-layer size, image digests and table-like layout cues for a page."""
+    text = page.extract_text() or ""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    short_lines = sum(1 for line in lines if len(line) < SHORT_LINE_CHARS)
+
+    contents = page.get_contents()
+    content_bytes = contents.get_data() if contents is not None else b""
+
+    images = []
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if xobjects:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            if xobject.get("/Subtype") == "/Image":
+                images.append(hashlib.sha256(xobject.get_data()).hexdigest())
+
+    return PageSignals(
+        text_chars=len("".join(text.split())),
+        images=images,
+        rule_ops=len(RULE_OPERATOR.findall(content_bytes)),
+        short_line_ratio=short_lines / len(lines) if len(lines) >= 15 else 0.0,
+    )
+
+
+def _page_ranges(pages: list[int], max_pages: int) -> list[tuple[int, int]]:
+    """Group sorted page numbers into contiguous ranges of at most max_pages."""
+    ranges: list[tuple[int, int]] = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < max_pages:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def _partition_page_range(
+    pdf_path: str, first_page: int, last_page: int, strategy: str
+) -> tuple[list[ParsedElement], float]:
+    """
+    Partition pages [first_page, last_page] (1-based) of a PDF.
+
+    Runs in a worker process: the range is copied into a temporary PDF and
+    page numbers are shifted back to the original document. Returns the
+    elements and the seconds spent.
+    """
+    start = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page_index in range(first_page - 1, last_page):
+        writer.add_page(reader.pages[page_index])
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        writer.write(tmp)
+        tmp.flush()
+        elements = partition_pdf(
+            filename=tmp.name,
+            strategy=strategy,
+            **PARTITION_OPTIONS,
+        )
+
+    parsed = []
+    for elem in elements:
+        # Unpaged elements belong to the range's first page
+        local_page = getattr(elem.metadata, "page_number", None) or 1
+        parsed.append(
+            ParsedElement(
+                text=str(elem).strip(),
+                page_number=first_page + local_page - 1,
+                element_type=PDFParser._get_type(elem),
+            )
+        )
+    return parsed, time.perf_counter() - start
+
+
+def group_elements_by_page(
+    elements: list[ParsedElement],
+) -> dict[int, list[ParsedElement]]:
+    """Group elements by page, keeping document order."""
+    pages: dict[int, list[ParsedElement]] = {}
     for elem in elements:
         if elem.page_number not in pages:
             pages[elem.page_number] = []
-        pages[elem.page_number].append(elem.text)
+        pages[elem.page_number].append(elem)
+    return pages
+
 
-    return {page: "\n\n".join(texts) for page, texts in pages.items()}
+def group_by_page(elements: list[ParsedElement]) -> dict[int, str]:
+    """Group elements by page and concatenate text."""
+    return {
+        page: "\n\n".join(elem.text for elem in page_elements)
+        for page, page_elements in group_elements_by_page(elements).items()
+    }
@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate` tokens/second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Block until `amount` tokens are available (capped at capacity)."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Shared requests-per-minute and tokens-per-minute budgets.
+
+    Buckets hold a few seconds of budget so workers cannot burst a full
+    minute of quota at once.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        burst_seconds: float = 6.0,
+    ):
+        self.requests = TokenBucket(
+            rate=requests_per_minute / 60.0,
+            capacity=requests_per_minute / 60.0 * burst_seconds,
+        )
+        self.tokens = TokenBucket(
+            rate=tokens_per_minute / 60.0,
+            capacity=tokens_per_minute / 60.0 * burst_seconds,
+        )
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request carrying `tokens` tokens may be sent."""
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: halves on throttling, +1 after a run of successes.
+    """
+
+    def __init__(
+        self, max_limit: int, min_limit: int = 1, recovery_successes: int = 10
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.recovery_successes = recovery_successes
+
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait for a free slot under the current limit."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        """Grow the limit back gradually after sustained success."""
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.recovery_successes and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        """Halve the limit after a rate-limit response."""
+        with self._condition:
+            new_limit = max(self.min_limit, self.limit // 2)
+            if new_limit < self.limit:
+                logger.warning(f"Rate limited: concurrency {self.limit} → {new_limit}")
+            self.limit = new_limit
+            self._successes = 0
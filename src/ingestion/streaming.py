@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+
+from src.indexing.index_builder import IndexBuilder
+from src.ingestion.chunker import Chunk, Chunker, ChunkWriter
+from src.ingestion.contextualizer import Contextualizer
+from src.ingestion.pdf_parser import PDFParser, group_elements_by_page
+from src.ingestion.token_chunker import TokenChunker
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output in its queue
+_DONE = object()
+
+
+class _StageError:
+    """Exception raised by a producer thread, re-raised by the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(items: Iterable, maxsize: int, name: str) -> Iterator:
+    """
+    Run an iterable in a background thread behind a bounded queue.
+
+    The producer runs ahead of the consumer by at most `maxsize` items, so
+    chained stages overlap while memory stays bounded. Producer exceptions
+    surface in the consumer; if the consumer stops early the producer is
+    told to stop at its next item.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name=f"ingest-{name}", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+class IngestionPipeline:
+    """
+    Streaming PDF → index pipeline.
+
+    Stages (parse page → chunk → contextualize → embed + upsert) are
+    generators chained through bounded queues, each running in its own
+    thread, so a page is being chunked and contextualized while later pages
+    are still being partitioned and earlier chunks are being embedded.
+    Nothing is materialized as a full document list; only the lexical
+    fields needed for the final BM25 pass are kept. With `chunks_path`,
+    chunks are also appended to the JSONL chunk store as they pass.
+    """
+
+    def __init__(
+        self,
+        parser: PDFParser,
+        chunker: Chunker | TokenChunker,
+        contextualizer: Contextualizer,
+        builder: IndexBuilder,
+        queue_size: int = 64,
+        embed_batch_size: int = 256,
+        chunks_path: str | None = None,
+    ):
+        self.parser = parser
+        self.chunker = chunker
+        self.contextualizer = contextualizer
+        self.builder = builder
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.chunks_path = chunks_path
+        self.counts = {"pages": 0, "chunks": 0}
+
+    def run(self, incremental: bool = True) -> dict:
+        """Ingest the PDF end to end; returns index diff and stage counts."""
+        start = time.perf_counter()
+
+        pages = prefetch(self.parser.iter_pages(), self.queue_size, "parse")
+        chunks = prefetch(self._chunk(pages), self.queue_size, "chunk")
+        contextualized = prefetch(
+            self.contextualizer.iter_context(chunks), self.queue_size, "context"
+        )
+
+        with ExitStack() as stack:
+            if self.chunks_path:
+                # Tee contextualized chunks into the chunk store on the way
+                writer = stack.enter_context(ChunkWriter(self.chunks_path))
+                contextualized = self._tee(contextualized, writer)
+
+            stats = self.builder.build_indices_streaming(
+                contextualized, incremental=incremental, batch_size=self.embed_batch_size
+            )
+        stats.update(self.counts)
+        stats["parse"] = self.parser.last_parse_stats
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    @staticmethod
+    def _tee(chunks: Iterable[Chunk], writer: ChunkWriter) -> Iterator[Chunk]:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+
+    def _chunk(self, pages: Iterable[tuple[int, list]]) -> Iterator[Chunk]:
+        """Chunk pages as they arrive from the parser."""
+        for _, elements in pages:
+            for page_num, page_elements in group_elements_by_page(elements).items():
+                self.counts["pages"] += 1
+                for chunk in self.chunker.chunk_elements(page_num, page_elements):
+                    self.counts["chunks"] += 1
+                    yield chunk
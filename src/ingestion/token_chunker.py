@@ -0,0 +1,190 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from transformers import AutoTokenizer
+
+from src.ingestion.chunker import Chunk
+from src.ingestion.pdf_parser import ParsedElement
+
+logger = logging.getLogger(__name__)
+
+# Elements kept whole even when they exceed the chunk budget
+ATOMIC_TYPES = frozenset({"table", "list"})
+
+# Separator between elements in the page text (as in group_by_page)
+ELEMENT_SEPARATOR = "\n\n"
+
+
+@dataclass(slots=True)
+class _Piece:
+    """Span of page text to pack into chunks (an element or a window of one)."""
+
+    start: int
+    end: int
+    tokens: int
+    is_title: bool
+    standalone: bool  # windows of an oversized element are chunks on their own
+
+
+class TokenChunker:
+    """
+    Structure-aware chunker sized in embedding-model tokens.
+
+    Works on the parsed elements of each page: whole elements are packed
+    into chunks of at most `chunk_tokens` tokens, a title starts a new
+    chunk once the current one holds a quarter of the budget (so procedures
+    stay together under their headings without tiny fragments), tables
+    and lists are never split, and only plain text longer than the budget
+    is cut into overlapping token windows. Chunks are spans of the page
+    text (`char_start`/`char_end`), which is the elements joined as in
+    `group_by_page`. All element texts are tokenized in one batched call.
+    """
+
+    def __init__(
+        self,
+        tokenizer_name: str,
+        chunk_tokens: int = 384,
+        overlap_tokens: int = 48,
+    ):
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be in [0, chunk_tokens)")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.last_token_counts: list[int] = []
+
+    def chunk_pages(self, pages: dict[int, list[ParsedElement]]) -> list[Chunk]:
+        """Create child chunks from the elements of every page."""
+        logger.info(
+            f"Chunking {len(pages)} pages (chunk_tokens={self.chunk_tokens}, "
+            f"overlap_tokens={self.overlap_tokens})"
+        )
+
+        offsets = self._tokenize(
+            [elem.text for elements in pages.values() for elem in elements]
+        )
+
+        all_chunks: list[Chunk] = []
+        token_counts: list[int] = []
+        position = 0
+        for page_num, elements in pages.items():
+            page_offsets = offsets[position : position + len(elements)]
+            position += len(elements)
+            chunks, counts = self._chunk_page(page_num, elements, page_offsets)
+            all_chunks.extend(chunks)
+            token_counts.extend(counts)
+
+        self.last_token_counts = token_counts
+        logger.info(f"Created {len(all_chunks)} chunks")
+        return all_chunks
+
+    def chunk_elements(self, page_num: int, elements: list[ParsedElement]) -> list[Chunk]:
+        """Create child chunks for one parent page."""
+        chunks, self.last_token_counts = self._chunk_page(
+            page_num, elements, self._tokenize([elem.text for elem in elements])
+        )
+        return chunks
+
+    def _tokenize(self, texts: list[str]) -> list[np.ndarray]:
+        """Per-text (n_tokens, 2) character offsets of its tokens."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+        )
+        return [
+            np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+            for offsets in encoded["offset_mapping"]
+        ]
+
+    def _pieces(
+        self, elements: list[ParsedElement], offsets: list[np.ndarray]
+    ) -> list[_Piece]:
+        """Element spans in page coordinates, windowing oversized text."""
+        pieces = []
+        step = self.chunk_tokens - self.overlap_tokens
+        base = 0
+        for elem, elem_offsets in zip(elements, offsets):
+            n_tokens = len(elem_offsets)
+            is_title = elem.element_type == "title"
+
+            if n_tokens <= self.chunk_tokens or elem.element_type in ATOMIC_TYPES:
+                pieces.append(
+                    _Piece(base, base + len(elem.text), n_tokens, is_title, False)
+                )
+            else:
+                for window_start in range(0, n_tokens, step):
+                    window_end = min(window_start + self.chunk_tokens, n_tokens)
+                    pieces.append(
+                        _Piece(
+                            base + int(elem_offsets[window_start, 0]),
+                            base + int(elem_offsets[window_end - 1, 1]),
+                            window_end - window_start,
+                            is_title,
+                            True,
+                        )
+                    )
+                    if window_end == n_tokens:
+                        break
+
+            base += len(elem.text) + len(ELEMENT_SEPARATOR)
+        return pieces
+
+    def _chunk_page(
+        self,
+        page_num: int,
+        elements: list[ParsedElement],
+        offsets: list[np.ndarray],
+    ) -> tuple[list[Chunk], list[int]]:
+        """Pack a page's pieces into chunks; returns chunks and their token counts."""
+        page_text = ELEMENT_SEPARATOR.join(elem.text for elem in elements)
+        chunks: list[Chunk] = []
+        token_counts: list[int] = []
+        current: list[_Piece] = []
+
+        def flush() -> None:
+            if not current:
+                return
+            start, end = current[0].start, current[-1].end
+            text = page_text[start:end]
+            chunks.append(
+                Chunk(
+                    chunk_id=f"p{page_num}_c{len(chunks)}",
+                    text=text,
+                    contextualized_text=text,
+                    page_number=page_num,
+                    parent_page_text=page_text,
+                    char_start=start,
+                    char_end=end,
+                )
+            )
+            token_counts.append(sum(piece.tokens for piece in current))
+            current.clear()
+
+        for piece in self._pieces(elements, offsets):
+            # Headings stay attached to what follows them, even past the budget
+            heading_only = all(p.is_title for p in current)
+            size = sum(p.tokens for p in current)
+            over_budget = size + piece.tokens > self.chunk_tokens
+            # A heading starts a new section, unless the current chunk is still tiny
+            new_section = piece.is_title and size >= self.chunk_tokens // 4
+            if current and (
+                (heading_only and piece.is_title and over_budget)
+                or (
+                    not heading_only
+                    and (piece.standalone or new_section or over_budget)
+                )
+            ):
+                flush()
+
+            current.append(piece)
+            if piece.standalone:
+                flush()
+        flush()
+
+        return chunks, token_counts
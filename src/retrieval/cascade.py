@@ -0,0 +1,110 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CandidatePruner:
+    """
+    Cheap first-stage cutoff applied before the cross-encoder.
+
+    Candidates are ordered by a first-stage score already present on each
+    result (`rrf_score`, `dense_score` or `bm25_score`) and the list is cut
+    to an adaptive size between `min_candidates` and `max_candidates`: it
+    stops at the first candidate scoring below `min_relative_score` × top
+    score, or right after a gap larger than `separation_ratio` × the score
+    spread (i.e. the leaders are clearly separated from the tail).
+    """
+
+    SCORE_KEYS = ("rrf_score", "dense_score", "bm25_score")
+
+    def __init__(
+        self,
+        score_key: str = "rrf_score",
+        min_candidates: int = 10,
+        max_candidates: int = 50,
+        min_relative_score: float = 0.0,
+        separation_ratio: float = 0.25,
+    ):
+        """
+        Initialize pruner.
+        """
+        if score_key not in self.SCORE_KEYS:
+            raise ValueError(
+                f"Unknown cascade score key '{score_key}', "
+                f"expected one of {self.SCORE_KEYS}"
+            )
+
+        self.score_key = score_key
+        self.min_candidates = max(1, min_candidates)
+        self.max_candidates = max(self.min_candidates, max_candidates)
+        self.min_relative_score = min_relative_score
+        self.separation_ratio = separation_ratio
+
+    def order(self, results: list[dict]) -> list[dict]:
+        """Sort results by the cheap first-stage score (descending)."""
+        return sorted(results, key=lambda r: r.get(self.score_key, 0.0), reverse=True)
+
+    def cutoff(self, ordered: list[dict]) -> int:
+        """
+        Number of candidates to keep from an already ordered list.
+        """
+        n = min(len(ordered), self.max_candidates)
+        if n <= self.min_candidates:
+            return n
+
+        scores = [r.get(self.score_key, 0.0) for r in ordered[:n]]
+        top = scores[0]
+        spread = top - scores[-1]
+
+        for i in range(self.min_candidates, n):
+            # Tail is too weak relative to the leader
+            if top > 0 and scores[i] < top * self.min_relative_score:
+                return i
+            # Leaders are clearly separated from the rest
+            gap = scores[i - 1] - scores[i]
+            if spread > 0 and self.separation_ratio > 0:
+                if gap >= self.separation_ratio * spread:
+                    return i
+
+        return n
+
+    def prune(self, results: list[dict]) -> list[dict]:
+        """
+        Keep only the candidates worth sending to the cross-encoder.
+        """
+        if not results:
+            return []
+
+        ordered = self.order(results)
+        keep = self.cutoff(ordered)
+
+        logger.info(
+            f"Cascade pruned {len(results)} → {keep} candidates "
+            f"(score_key={self.score_key})"
+        )
+        return ordered[:keep]
+
+
+def recall_at_cutoffs(
+    results: list[dict],
+    relevant_pages: set[int],
+    cutoffs: list[int],
+    score_key: str = "rrf_score",
+) -> dict[int, float]:
+    """
+    Page recall of the cheap ordering at each cutoff.
+
+    Recall is measured against the relevant pages reachable in the full
+    candidate list, so `1 - recall` is exactly what pruning at that cutoff
+    would lose before the cross-encoder ever sees it.
+    """
+    ordered = sorted(results, key=lambda r: r.get(score_key, 0.0), reverse=True)
+    reachable = relevant_pages & {r["page_number"] for r in ordered}
+    if not reachable:
+        return {cutoff: 0.0 for cutoff in cutoffs}
+
+    recalls = {}
+    for cutoff in cutoffs:
+        kept = {r["page_number"] for r in ordered[:cutoff]}
+        recalls[cutoff] = len(reachable & kept) / len(reachable)
+    return recalls
@@ -1,12 +1,17 @@
 import logging
-import pickle
 from pathlib import Path
 
 import chromadb
 import numpy as np
 from chromadb.config import Settings
+from chromadb.errors import NotFoundError
 
+from src.indexing.bm25 import tokenize
 from src.indexing.embedder import Embedder
+from src.indexing.lexical_index import LexicalIndex, StaleIndexError
+from src.indexing.vector_store import ChromaVectorStore, MatrixVectorStore
+
+VECTOR_BACKENDS = ("chroma", "matrix")
 
 logger = logging.getLogger(__name__)
 
@@ -22,52 +27,150 @@ class HybridRetriever:
         persist_dir: str,
         embedding_model: str,
         collection_name: str = "boeing_737",
+        embedder: Embedder | None = None,
+        verify_index: bool = False,
+        vector_backend: str = "chroma",
+        ivf_nprobe: int = 8,
     ):
         """
         Initialize hybrid retriever.
         """
+        if vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(
+                f"Unknown vector backend '{vector_backend}', expected {VECTOR_BACKENDS}"
+            )
+
         self.persist_dir = Path(persist_dir)
-        self.embedder = Embedder(embedding_model, use_fp16=False)
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
+        self.embedder = embedder or Embedder(embedding_model, use_fp16=False)
+        self.verify_index = verify_index
+        self.ivf_nprobe = ivf_nprobe
+
+        # Load BM25
+        logger.info("Loading BM25 index")
+        self._load_bm25()
+
+        # Load dense backend (rows aligned with the lexical index)
+        self.vector_backend = vector_backend
+        self.vector_store = self._load_vector_store(collection_name, ivf_nprobe)
+
+        if len(self.vector_store) != len(self.index):
+            raise StaleIndexError(
+                f"Lexical index has {len(self.index)} chunks but the {vector_backend} "
+                f"index has {len(self.vector_store)}; rebuild with scripts/build_index.py"
+            )
+
+        # Version of what was loaded; compare with `index_version()` to spot rebuilds
+        self.version = f"{self.index.version}:{self._dense_version()}"
+
+        logger.info(f"✓ Hybrid retriever ready (vector_backend={vector_backend})")
+
+    def _load_vector_store(
+        self, collection_name: str, ivf_nprobe: int
+    ) -> ChromaVectorStore | MatrixVectorStore:
+        """Open the configured dense search backend."""
+        if self.vector_backend == "matrix":
+            store = MatrixVectorStore(self.persist_dir / "dense", nprobe=ivf_nprobe)
+            if store.lexical_version != self.index.version:
+                raise StaleIndexError(
+                    "Dense index was built against a different lexical index; "
+                    "rebuild with scripts/build_index.py"
+                )
+            return store
 
-        # Load ChromaDB
         logger.info(f"Loading ChromaDB from {self.persist_dir}")
         self.client = chromadb.PersistentClient(
             path=str(self.persist_dir), settings=Settings(anonymized_telemetry=False)
         )
-        self.collection = self.client.get_collection(collection_name)
+        try:
+            self.collection = self.client.get_collection(collection_name)
+        except NotFoundError as e:
+            raise StaleIndexError(
+                f"Collection '{collection_name}' not found; "
+                "rebuild with scripts/build_index.py"
+            ) from e
+        return ChromaVectorStore(self.collection, self.row_by_id)
 
-        # Load BM25
-        logger.info("Loading BM25 index")
-        self._load_bm25()
+    def _load_bm25(self) -> None:
+        """Memory-map BM25 index and metadata from disk."""
+        self.index = LexicalIndex.open(
+            self.persist_dir / "lexical", verify_checksum=self.verify_index
+        )
 
-        logger.info("✓ Hybrid retriever ready")
+        self.bm25 = self.index.bm25
 
-    def _load_bm25(self) -> None:
-        """Load BM25 index and metadata from disk."""
-        bm25_path = self.persist_dir / "bm25_index.pkl"
+        # Columnar chunk store addressed by integer row id
+        self.chunk_ids = self.index.chunk_ids
+        self.texts = self.index.texts
+        self.original_texts = self.index.original_texts
+        self.page_numbers = self.index.page_numbers
+        self.row_by_id: dict[str, int] = {
+            chunk_id: row for row, chunk_id in enumerate(self.chunk_ids)
+        }
 
-        if not bm25_path.exists():
-            raise FileNotFoundError(f"BM25 index not found: {bm25_path}")
+        logger.info(f"✓ BM25 index loaded ({len(self.chunk_ids)} chunks)")
 
-        with open(bm25_path, "rb") as f:
-            data = pickle.load(f)
+    def _dense_version(self) -> str:
+        """
+        On-disk state of the dense store: the matrix header's mtime, or the
+        id of the collection under the live name (a full rebuild swaps in a
+        new one; incremental builds change the lexical checksum).
+        """
+        if self.vector_backend == "matrix":
+            try:
+                return str((self.persist_dir / "dense" / "header.json").stat().st_mtime_ns)
+            except FileNotFoundError:
+                return ""
+        try:
+            return str(self.client.get_collection(self.collection_name).id)
+        except Exception:  # collection missing mid-rebuild
+            return ""
+
+    def index_version(self) -> str:
+        """
+        Fingerprint of the indices currently on disk (lexical header checksum
+        + dense store state), re-read on every call so a rebuild by
+        scripts/build_index.py or ingest shows up as a change from `version`.
+        """
+        lexical = LexicalIndex.read_version(self.persist_dir / "lexical")
+        return f"{lexical}:{self._dense_version()}"
 
-        self.bm25 = data["bm25"]
-        self.chunk_ids = data["chunk_ids"]
-        self.texts = data["texts"]
-        self.page_numbers = data["page_numbers"]
-        self.original_texts = data["original_texts"]
+    def is_stale(self) -> bool:
+        """Whether the indices on disk differ from the loaded ones."""
+        return self.index_version() != self.version
 
-        logger.info(f"✓ BM25 index loaded ({len(self.chunk_ids)} chunks)")
+    def reload(self) -> "HybridRetriever":
+        """
+        A new retriever over the indices currently on disk, sharing this
+        one's embedder. This retriever keeps working for in-flight searches;
+        raises StaleIndexError if the on-disk indices are mid-rebuild.
+        """
+        return HybridRetriever(
+            persist_dir=str(self.persist_dir),
+            embedding_model=self.embedding_model,
+            collection_name=self.collection_name,
+            embedder=self.embedder,
+            verify_index=self.verify_index,
+            vector_backend=self.vector_backend,
+            ivf_nprobe=self.ivf_nprobe,
+        )
 
-    def search(self, query: str, top_k: int = 100) -> list[dict]:
+    def search(
+        self,
+        query: str,
+        top_k: int = 100,
+        query_embedding: np.ndarray | None = None,
+    ) -> list[dict]:
         """
         Perform hybrid search with RRF fusion.
+
+        Pass `query_embedding` if the caller already embedded the query.
         """
         logger.info(f"Hybrid search: '{query[:50]}...' (top_k={top_k})")
 
         # Vector search
-        vector_results = self._vector_search(query, top_k)
+        vector_results = self._vector_search(query, top_k, query_embedding)
 
         # BM25 search
         bm25_results = self._bm25_search(query, top_k)
@@ -80,74 +183,131 @@ class HybridRetriever:
         )
 
         # Format and return top_k results
-        formatted = self._format_results(fused_results[:top_k])
+        formatted = self._format_results(
+            fused_results[:top_k],
+            dense_scores={row: score for row, _, score in vector_results},
+            bm25_scores={row: score for row, _, score in bm25_results},
+        )
 
         logger.info(f"✓ Retrieved {len(formatted)} results")
         return formatted
 
-    def _vector_search(self, query: str, top_k: int) -> list[tuple[str, int]]:
+    def search_batch(self, queries: list[str], top_k: int = 100) -> list[list[dict]]:
+        """
+        Hybrid search for many queries, amortizing every stage.
+
+        All queries are embedded in one encode call and searched with one
+        multi-vector dense query; BM25 scores every query in one sparse
+        matrix-matrix product. Results match `search` query by query.
+        """
+        if not queries:
+            return []
+
+        logger.info(f"Hybrid batch search: {len(queries)} queries (top_k={top_k})")
+
+        embeddings = self.embedder.embed_queries(queries)
+        dense = self.vector_store.search(embeddings, top_k)
+        lexical = self.bm25.top_k_batch([tokenize(query) for query in queries], top_k)
+
+        batch_results = []
+        for (dense_rows, dense_scores), (bm25_rows, bm25_scores) in zip(dense, lexical):
+            vector_results = [
+                (int(row), rank, float(score))
+                for rank, (row, score) in enumerate(zip(dense_rows, dense_scores))
+            ]
+            bm25_results = [
+                (int(row), rank, float(score))
+                for rank, (row, score) in enumerate(zip(bm25_rows, bm25_scores))
+            ]
+            fused_results = self._reciprocal_rank_fusion(
+                vector_results=vector_results, bm25_results=bm25_results, k=60
+            )
+            batch_results.append(
+                self._format_results(
+                    fused_results[:top_k],
+                    dense_scores={row: score for row, _, score in vector_results},
+                    bm25_scores={row: score for row, _, score in bm25_results},
+                )
+            )
+
+        logger.info(f"✓ Retrieved results for {len(batch_results)} queries")
+        return batch_results
+
+    def _vector_search(
+        self, query: str, top_k: int, query_embedding: np.ndarray | None = None
+    ) -> list[tuple[int, int, float]]:
         """
         Perform vector similarity search.
         """
         # Generate query embedding
-        query_embedding = self.embedder.embed_query(query)
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_query(query)
 
-        # Search ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()], n_results=top_k
-        )
+        # Search the dense backend; it returns lexical rows directly
+        rows, scores = self.vector_store.search(query_embedding, top_k)[0]
 
-        # Return as (chunk_id, rank) pairs
-        chunk_ids = results["ids"][0]
-        return [(chunk_id, rank) for rank, chunk_id in enumerate(chunk_ids)]
+        # Return as (row, rank, cosine similarity) triples
+        return [
+            (int(row), rank, float(score))
+            for rank, (row, score) in enumerate(zip(rows, scores))
+        ]
 
-    def _bm25_search(self, query: str, top_k: int) -> list[tuple[str, int]]:
+    def _bm25_search(self, query: str, top_k: int) -> list[tuple[int, int, float]]:
         """
         Perform BM25 lexical search.
         """
-        tokenized_query = query.lower().split()
-        scores = self.bm25.get_scores(tokenized_query)
-        top_indices = np.argsort(scores)[::-1][:top_k]
-        return [(self.chunk_ids[idx], rank) for rank, idx in enumerate(top_indices)]
+        rows, scores = self.bm25.top_k(tokenize(query), top_k)
+        return [
+            (int(row), rank, float(score))
+            for rank, (row, score) in enumerate(zip(rows, scores))
+        ]
 
     def _reciprocal_rank_fusion(
         self,
-        vector_results: list[tuple[str, int]],
-        bm25_results: list[tuple[str, int]],
+        vector_results: list[tuple[int, int, float]],
+        bm25_results: list[tuple[int, int, float]],
         k: int = 60,
-    ) -> list[tuple[str, float]]:
+    ) -> list[tuple[int, float]]:
         """
         Fuse rankings using Reciprocal Rank Fusion.
         RRF formula: score(chunk) = sum(1 / (k + rank_i)) for all retrievers
         """
-        rrf_scores: dict[str, float] = {}
+        rrf_scores: dict[int, float] = {}
 
-        for chunk_id, rank in vector_results:
-            rrf_scores[chunk_id] = rrf_scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
-        for chunk_id, rank in bm25_results:
-            rrf_scores[chunk_id] = rrf_scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+        for row, rank, _ in vector_results:
+            rrf_scores[row] = rrf_scores.get(row, 0.0) + 1.0 / (k + rank + 1)
+        for row, rank, _ in bm25_results:
+            rrf_scores[row] = rrf_scores.get(row, 0.0) + 1.0 / (k + rank + 1)
 
         sorted_results = sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)
 
         return sorted_results
 
-    def _format_results(self, fused_results: list[tuple[str, float]]) -> list[dict]:
+    def _format_results(
+        self,
+        fused_results: list[tuple[int, float]],
+        dense_scores: dict[int, float],
+        bm25_scores: dict[int, float],
+    ) -> list[dict]:
         """
         Format fused results with full chunk metadata.
+
+        First-stage scores are attached so a cheap cascade can prune
+        candidates before the cross-encoder; chunks missing from one
+        retriever's top_k get 0.0 for that score.
         """
         formatted = []
 
-        for chunk_id, rrf_score in fused_results:
-            # Get index of chunk
-            idx = self.chunk_ids.index(chunk_id)
-
+        for row, rrf_score in fused_results:
             formatted.append(
                 {
-                    "chunk_id": chunk_id,
-                    "text": self.texts[idx],  # Contextualized text
-                    "original_text": self.original_texts[idx],  # Non-contextualized
-                    "page_number": self.page_numbers[idx],
+                    "chunk_id": self.chunk_ids[row],
+                    "text": self.texts[row],  # Contextualized text
+                    "original_text": self.original_texts[row],  # Non-contextualized
+                    "page_number": int(self.page_numbers[row]),
                     "rrf_score": float(rrf_score),
+                    "dense_score": dense_scores.get(row, 0.0),
+                    "bm25_score": bm25_scores.get(row, 0.0),
                 }
             )
 
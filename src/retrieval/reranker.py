@@ -1,25 +1,81 @@
 import logging
+import threading
 
 from FlagEmbedding import FlagReranker
 
+from src.batching import MicroBatcher
+from src.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 
 class Reranker:
     """
     Cross-encoder reranker for re-scoring retrieved chunks.
+
+    Pairs from concurrent rerank calls are coalesced into shared
+    `compute_score` batches, and every (query, chunk) score is memoized so
+    repeated questions never re-run the cross-encoder on the same pair.
+    Chunk ids are positional, so cached scores are dropped whenever the
+    index version changes (see `sync_version`).
     """
 
     def __init__(
-        self, model_name: str = "BAAI/bge-reranker-v2-m3", use_fp16: bool = False
+        self,
+        model_name: str = "BAAI/bge-reranker-v2-m3",
+        use_fp16: bool = False,
+        cache_size: int = 50000,
+        cache_ttl_seconds: float | None = 3600.0,
+        batch_window_ms: float = 5.0,
+        max_batch_pairs: int = 256,
     ):
         """
         Initialize reranker model.
         """
         logger.info(f"Loading reranker model: {model_name}")
+        self.model_name = model_name
         self.model = FlagReranker(model_name, use_fp16=use_fp16)
+
+        # (normalized query, chunk_id, model) -> normalized score
+        self.score_cache: TTLCache[tuple[str, str, str], float] = TTLCache(
+            max_size=cache_size, ttl_seconds=cache_ttl_seconds
+        )
+        self.index_version: str | None = None
+        self._version_lock = threading.Lock()
+        self.pair_batcher: MicroBatcher[tuple[str, str], float] = MicroBatcher(
+            self._score_pairs,
+            max_batch_size=max_batch_pairs,
+            max_wait_ms=batch_window_ms,
+            name="rerank-batcher",
+        )
         logger.info("Reranker ready")
 
+    def sync_version(self, index_version: str) -> None:
+        """Drop every cached score if the index changed since they were computed."""
+        with self._version_lock:
+            if index_version == self.index_version:
+                return
+            if self.index_version is not None:
+                logger.info(
+                    f"Index version changed ({self.index_version[:12]} → "
+                    f"{index_version[:12]}); clearing rerank score cache"
+                )
+            self.score_cache.clear()
+            self.index_version = index_version
+
+    def _cache_score(
+        self, key: tuple[str, str, str], score: float, index_version: str | None
+    ) -> None:
+        """Memoize a score unless the index changed while it was being computed."""
+        with self._version_lock:
+            if index_version == self.index_version:
+                self.score_cache.put(key, score)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize query text for cache keys (case and whitespace)."""
+        return " ".join(query.lower().split())
+
     def rerank(self, query: str, results: list[dict], top_k: int = 10) -> list[dict]:
         """
         Rerank retrieved results using cross-encoder.
@@ -29,22 +85,101 @@ class Reranker:
 
         logger.info(f"Reranking {len(results)} results (top_k={top_k})")
 
-        # Prepare (query, document) pairs
-        pairs = [[query, result["original_text"]] for result in results]
+        # Serve previously scored pairs from cache
+        index_version = self.index_version
+        normalized = self.normalize_query(query)
+        missing = []
+        for result in results:
+            score = self.score_cache.get(
+                (normalized, result["chunk_id"], self.model_name)
+            )
+            if score is None:
+                missing.append(result)
+            else:
+                result["rerank_score"] = score
 
-        # Get rerank scores
-        scores = self.model.compute_score(pairs, normalize=True)
+        # Score the rest in shared batches with concurrent requests
+        if missing:
+            pairs = [(query, result["original_text"]) for result in missing]
+            scores = self.pair_batcher.submit_many(pairs)
 
-        # Handle single result case
-        if isinstance(scores, float):
-            scores = [scores]
+            for result, score in zip(missing, scores):
+                result["rerank_score"] = score
+                self._cache_score(
+                    (normalized, result["chunk_id"], self.model_name),
+                    score,
+                    index_version,
+                )
 
-        # Add rerank scores to results
-        for result, score in zip(results, scores):
-            result["rerank_score"] = float(score)
+        logger.info(
+            f"Rerank cache: {len(results) - len(missing)} hits, {len(missing)} misses"
+        )
 
         # Sort by rerank score descending
         reranked = sorted(results, key=lambda x: x["rerank_score"], reverse=True)
 
         logger.info(f"Reranked to top {min(top_k, len(reranked))} results")
         return reranked[:top_k]
+
+    def rerank_batch(
+        self, queries: list[str], results_list: list[list[dict]], top_k: int = 10
+    ) -> list[list[dict]]:
+        """
+        Rerank the results of many queries with one cross-encoder call.
+
+        Cached pairs are served as in `rerank`; every missing pair across
+        all queries goes into a single `compute_score` call (which batches
+        internally), bypassing the micro-batcher that would split it.
+        """
+        index_version = self.index_version
+        missing: list[tuple[str, str, dict]] = []
+        for query, results in zip(queries, results_list):
+            normalized = self.normalize_query(query)
+            for result in results:
+                score = self.score_cache.get(
+                    (normalized, result["chunk_id"], self.model_name)
+                )
+                if score is None:
+                    missing.append((query, normalized, result))
+                else:
+                    result["rerank_score"] = score
+
+        total = sum(len(results) for results in results_list)
+        logger.info(
+            f"Batch rerank of {len(queries)} queries: {total - len(missing)} cache "
+            f"hits, {len(missing)} pairs to score"
+        )
+
+        if missing:
+            scores = self._score_pairs(
+                [(query, result["original_text"]) for query, _, result in missing]
+            )
+            for (_, normalized, result), score in zip(missing, scores):
+                result["rerank_score"] = score
+                self._cache_score(
+                    (normalized, result["chunk_id"], self.model_name),
+                    score,
+                    index_version,
+                )
+
+        return [
+            sorted(results, key=lambda x: x["rerank_score"], reverse=True)[:top_k]
+            for results in results_list
+        ]
+
+    def _score_pairs(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Run the cross-encoder over one coalesced batch of pairs."""
+        scores = self.model.compute_score([list(pair) for pair in pairs], normalize=True)
+
+        # Handle single result case
+        if isinstance(scores, float):
+            scores = [scores]
+
+        return [float(score) for score in scores]
+
+    def stats(self) -> dict:
+        """Cache and batching counters."""
+        return {
+            "score_cache": self.score_cache.stats(),
+            "batching": self.pair_batcher.stats(),
+        }
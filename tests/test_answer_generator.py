@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("google.api_core.exceptions")
+
+from src.generation.answer_generator import (  # noqa: E402
+    AnswerGenerator,
+    CitationStripper,
+)
+from src.generation.llm_client import ResilientLLMClient, StubLLMClient  # noqa: E402
+
+CHUNKS = [{"page_number": page, "original_text": "..."} for page in (10, 11, 12, 13, 14)]
+
+ANSWERS = [
+    "bar.  [Document 5][Document 1]foo",
+    "Set flaps 15 [Document 1]. Then arm the speedbrake [Document 2, Document 3].",
+    "  [Document 1] Leading citation and trailing space  ",
+    "Partial [Doc and [Document 1, 2] then [ a bracket that is not one",
+    "Two citations [Document 1] [Document 2] in a row [Document 4]",
+    "Ends with a citation [Document 2]",
+    "No citations at all.",
+]
+
+
+@pytest.fixture
+def generator() -> AnswerGenerator:
+    return AnswerGenerator(client=ResilientLLMClient(StubLLMClient()))
+
+
+def _stream(answer: str, cuts: list[int]) -> tuple[str, str]:
+    """Feed `answer` split at `cuts`; return (concatenated output, stripper.text)."""
+    stripper = CitationStripper(AnswerGenerator.CITATION_PATTERN)
+    bounds = [0, *cuts, len(answer)]
+    output = "".join(
+        stripper.feed(answer[start:end]) for start, end in zip(bounds, bounds[1:])
+    )
+    output += stripper.finish()
+    return output, stripper.text
+
+
+@pytest.mark.parametrize("answer", ANSWERS)
+def test_stream_matches_batch_for_every_split(generator, answer):
+    expected, _ = generator._finalize_answer(answer, CHUNKS)
+
+    for cut in range(len(answer) + 1):
+        assert _stream(answer, [cut]) == (expected, expected), cut
+    characters = list(range(1, len(answer)))
+    assert _stream(answer, characters) == (expected, expected)
+
+
+def test_adjacent_citations_keep_one_space(generator):
+    answer = "bar.  [Document 5][Document 1]foo"
+
+    assert generator._finalize_answer(answer, CHUNKS)[0] == "bar. foo"
+    assert _stream(answer, [len("bar.  [Document 5]")])[0] == "bar. foo"
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("FlagEmbedding")
+pytest.importorskip("google.api_core")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from src.api import routes  # noqa: E402
+from src.api.pipeline import QueryPipeline  # noqa: E402
+from src.api.query_cache import QueryCache  # noqa: E402
+from src.indexing.index_builder import IndexBuilder  # noqa: E402
+from src.ingestion.chunker import Chunk  # noqa: E402
+from src.retrieval import reranker as reranker_module  # noqa: E402
+from src.retrieval.hybrid_search import HybridRetriever  # noqa: E402
+
+DIMENSION = 32
+
+PAGES = {
+    1: "flaps fifteen for takeoff",
+    2: "speedbrake armed for landing",
+}
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder standing in for BGE-M3."""
+
+    dimension = DIMENSION
+
+    def __init__(self):
+        self.last_embed_stats: dict = {}
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.full((len(texts), DIMENSION), 1e-3, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                matrix[row, zlib.crc32(token.encode("utf-8")) % DIMENSION] += 1.0
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def embed_documents(self, texts, token_budget=0, max_length=0, output_path=None):
+        self.last_embed_stats = {
+            "documents": len(texts),
+            "batches": 1,
+            "tokens": 0,
+            "padded_tokens": 0,
+            "seconds": 0.0,
+            "tokens_per_second": 0.0,
+        }
+        return self._embed(texts)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._embed([query])[0]
+
+    def embed_queries(self, queries: list[str], batch_size: int = 64) -> np.ndarray:
+        return self._embed(queries)
+
+
+class OverlapReranker:
+    """Cross-encoder stand-in scoring a pair by shared words."""
+
+    def __init__(self, model_name, use_fp16=False):
+        self.calls = 0
+
+    def compute_score(self, pairs, normalize=True):
+        self.calls += 1
+        return [
+            len(set(query.split()) & set(text.split())) / 10 for query, text in pairs
+        ]
+
+
+def _chunks(pages: dict[int, str]) -> list[Chunk]:
+    return [
+        Chunk(
+            chunk_id=f"p{page}_c0",
+            text=text,
+            contextualized_text=text,
+            page_number=page,
+            parent_page_text=text,
+        )
+        for page, text in pages.items()
+    ]
+
+
+@pytest.fixture
+def running(tmp_path, monkeypatch):
+    """A built index, a pipeline serving it, and an empty answer cache."""
+    embedder = HashingEmbedder()
+    builder = IndexBuilder(str(tmp_path), "hashing", embedder=embedder)
+    builder.build_indices(_chunks(PAGES))
+
+    retriever = HybridRetriever(
+        str(tmp_path), "hashing", embedder=embedder, vector_backend="chroma"
+    )
+    pipeline = QueryPipeline(retriever=retriever, reranker=None, generator=None)
+    cache = QueryCache(dimension=DIMENSION, semantic_max_distance=0.0)
+    monkeypatch.setattr(routes, "_retriever", retriever)
+    monkeypatch.setattr(routes, "_query_cache", cache)
+    monkeypatch.setattr(routes.settings, "query_cache_enabled", True)
+
+    yield builder, pipeline, cache
+    pipeline.shutdown()
+
+
+def _search_ids(pipeline: QueryPipeline, question: str) -> list[str]:
+    results = asyncio.run(pipeline.search(question, top_k=10))
+    return [result["chunk_id"] for result in results]
+
+
+def test_incremental_rebuild_reloads_retriever_and_clears_cache(running):
+    builder, pipeline, cache = running
+    old_retriever = pipeline.retriever
+    old_version = asyncio.run(routes.sync_index(pipeline))
+    cache.put("gear?", None, ("old answer", [1]), old_version)
+    assert cache.get_exact("gear?") is not None
+
+    builder.build_indices(_chunks({**PAGES, 3: "gear lever down three green"}))
+
+    # Not reloaded yet: new ids from the live collection are skipped, not a KeyError
+    assert "p3_c0" not in _search_ids(pipeline, "gear lever down")
+
+    new_version = asyncio.run(routes.sync_index(pipeline))
+    assert new_version != old_version
+    assert pipeline.retriever is not old_retriever
+    assert routes._retriever is pipeline.retriever
+    assert cache.get_exact("gear?") is None
+    assert _search_ids(pipeline, "gear lever down")[0] == "p3_c0"
+
+    # An answer generated from the old index is not cached under the new one
+    cache.put("gear?", None, ("old answer", [1]), old_version)
+    assert cache.get_exact("gear?") is None
+
+
+def test_full_rebuild_swaps_collection_under_running_pipeline(running):
+    builder, pipeline, _ = running
+    old_retriever = pipeline.retriever
+    old_version = asyncio.run(routes.sync_index(pipeline))
+
+    builder.build_indices(_chunks({4: "engine fire checklist"}), incremental=False)
+
+    # The replaced collection is kept, so the old retriever still answers
+    assert _search_ids(pipeline, "flaps takeoff")[0] == "p1_c0"
+
+    assert asyncio.run(routes.sync_index(pipeline)) != old_version
+    assert pipeline.retriever is not old_retriever
+    assert _search_ids(pipeline, "engine fire") == ["p4_c0"]
+    assert asyncio.run(routes.sync_index(pipeline)) == pipeline.retriever.version
+
+
+def test_dense_matrix_written_only_for_matrix_backend(tmp_path):
+    embedder = HashingEmbedder()
+    chroma_dir, matrix_dir = tmp_path / "chroma", tmp_path / "matrix"
+
+    IndexBuilder(str(chroma_dir), "hashing", embedder=embedder).build_indices(
+        _chunks(PAGES)
+    )
+    assert not (chroma_dir / "dense").exists()
+
+    builder = IndexBuilder(
+        str(matrix_dir), "hashing", vector_backend="matrix", embedder=embedder
+    )
+    builder.build_indices(_chunks(PAGES))
+    builder.build_indices(_chunks({**PAGES, 3: "gear lever down three green"}))
+
+    retriever = HybridRetriever(
+        str(matrix_dir), "hashing", embedder=embedder, vector_backend="matrix"
+    )
+    assert retriever.vector_store.embeddings.dtype == np.float32
+    np.testing.assert_allclose(
+        retriever.vector_store.embeddings[retriever.row_by_id["p3_c0"]],
+        embedder.embed_query("gear lever down three green"),
+        rtol=1e-5,
+    )
+
+
+def test_rebuild_clears_rerank_scores(running, monkeypatch):
+    builder, pipeline, _ = running
+    monkeypatch.setattr(reranker_module, "FlagReranker", OverlapReranker)
+    pipeline.reranker = reranker_module.Reranker("overlap")
+    old_version = asyncio.run(routes.sync_index(pipeline))
+
+    results = asyncio.run(pipeline.search("flaps takeoff", top_k=10))
+    pipeline.reranker.rerank_batch(["flaps takeoff"], [results])
+    assert len(pipeline.reranker.score_cache) == len(results)
+
+    # p1_c0 now holds different text: its cached score must not survive
+    builder.build_indices(_chunks({1: "cabin pressure warning", 2: PAGES[2]}))
+    assert asyncio.run(routes.sync_index(pipeline)) != old_version
+    assert len(pipeline.reranker.score_cache) == 0
+
+    # A score computed against the old index is not cached under the new one
+    key = ("flaps takeoff", "p1_c0", "overlap")
+    pipeline.reranker._cache_score(key, 0.2, old_version)
+    assert len(pipeline.reranker.score_cache) == 0
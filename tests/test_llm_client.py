@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+google_exceptions = pytest.importorskip("google.api_core.exceptions")
+
+from src.generation.llm_client import (  # noqa: E402
+    DeadlineExceededError,
+    ResilientLLMClient,
+    StubLLMClient,
+)
+
+ANSWER = "Set the flaps to 15 [Document 1]."
+
+
+class ScriptedStub(StubLLMClient):
+    """Stub whose calls take the scripted delays (seconds) or raise the scripted errors."""
+
+    def __init__(self, script: list):
+        super().__init__(jitter=0.0, answer=ANSWER)
+        self.script = list(script)
+        self.started = 0
+        self.cancelled = 0
+
+    def _draw(self) -> float:
+        self.started += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+    async def generate(self, prompt: str, timeout: float | None = None) -> str:
+        try:
+            return await super().generate(prompt, timeout)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+class MidStreamFailure(StubLLMClient):
+    """Stub whose stream fails after its first token."""
+
+    def __init__(self):
+        super().__init__(jitter=0.0, answer=ANSWER)
+        self.streams = 0
+
+    async def stream(self, prompt: str, timeout: float | None = None):
+        self.streams += 1
+        yield "Set "
+        raise google_exceptions.ServiceUnavailable("stub: dropped mid-stream")
+
+
+async def _collect(stream) -> list[str]:
+    return [delta async for delta in stream]
+
+
+def test_slow_backend_exhausts_deadline():
+    client = ResilientLLMClient(ScriptedStub([1.0, 1.0]), max_retries=1)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(client.generate("q", deadline=time.monotonic() + 0.2))
+    assert client.timeouts == 1
+
+
+def test_waiting_for_a_slot_respects_deadline():
+    async def scenario():
+        client = ResilientLLMClient(ScriptedStub([1.0, 0.01]), max_concurrency=1)
+        busy = asyncio.ensure_future(client.generate("q"))
+        await asyncio.sleep(0.05)
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            await client.generate("q", deadline=time.monotonic() + 0.2)
+        assert time.monotonic() - start < 0.5
+        assert client.backend.started == 1
+
+        assert await busy == ANSWER
+
+    asyncio.run(scenario())
+
+
+def test_injected_503_is_retried():
+    backend = ScriptedStub([google_exceptions.ServiceUnavailable("injected"), 0.01])
+    client = ResilientLLMClient(backend, max_retries=2)
+
+    assert asyncio.run(client.generate("q")) == ANSWER
+    assert backend.started == 2
+    assert client.retries == 1
+    assert client.errors == 1
+
+
+def test_hedge_fires_after_p95_and_cancels_the_loser():
+    async def scenario():
+        backend = ScriptedStub([2.0, 0.01])
+        client = ResilientLLMClient(backend, hedge=True, hedge_min_samples=10)
+        for _ in range(10):
+            client.latency.observe(0.05)
+
+        start = time.monotonic()
+        assert await client.generate("q") == ANSWER
+        assert time.monotonic() - start < 1.0
+        await asyncio.sleep(0)  # let the cancellation land
+        return client, backend
+
+    client, backend = asyncio.run(scenario())
+    assert client.hedges == 1
+    assert client.hedge_wins == 1
+    assert backend.cancelled == 1
+    assert client.in_flight == 0
+
+
+def test_stream_retries_before_first_token():
+    backend = ScriptedStub([google_exceptions.ServiceUnavailable("injected"), 0.01])
+    client = ResilientLLMClient(backend, max_retries=2)
+
+    parts = asyncio.run(_collect(client.stream("q")))
+    assert "".join(parts) == ANSWER
+    assert backend.started == 2
+    assert client.retries == 1
+
+
+def test_stream_does_not_retry_after_first_token():
+    backend = MidStreamFailure()
+    client = ResilientLLMClient(backend, max_retries=2)
+    parts: list[str] = []
+
+    async def scenario():
+        async for delta in client.stream("q"):
+            parts.append(delta)
+
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        asyncio.run(scenario())
+    assert parts == ["Set "]
+    assert backend.streams == 1
+    assert client.retries == 0